@@ -1,4 +1,5 @@
 """
+>>> from _params import ArgStream
 >>> class dict1(dict): pass
 >>> class list1(list): pass
 >>> attrs = AttributeDict()
@@ -6,11 +7,11 @@
 >>> attrs.add_class_attr("dict", "a1", get=lambda x: x['a1'], set=lambda x, v: x.update({'a1': v}) )
 >>> attrs.add_class_attr("dict1", "a1", get=lambda x: x['a1_'], set=lambda x, v: x.update({'a1_': v}) )
 >>> attrs.add_class_attr("list", "a1", get=lambda x: x[-1], set=lambda x, v: x.append(v))
->>> src = [1]; d = {}; l = []; d1 = dict1(d); l1 = list1(l)
->>> attrs.read_params("a1", "get", [])
+>>> src = ArgStream((1,)); d = {}; l = []; d1 = dict1(d); l1 = list1(l)
+>>> attrs.read_params("a1", "get", ArgStream(()))
 []
 >>> attrs.read_params("a1", "set", src), src
-([1], [])
+([1], ArgStream(()))
 >>> attrs.action(d, "a1", "get", []), attrs.action(l, "a1", "get", []), attrs.action(d1, "a1", "get", []), attrs.action(l1, "a1", "get", [])
 (0, 0, 0, 0)
 >>> attrs.action(d, "a1", "set", [1]); attrs.action(l, "a1", "set", [1]); attrs.action(d1, "a1", "set", [1]); attrs.action(l1, "a1", "set", [1])
@@ -20,16 +21,15 @@
 ({'a1': 1}, [1], {'a1_': 1}, [1])
 """
 
-import re
+import sys
 import traceback
 import logging
-from _util import IronbotException
+from _clock import monotonic
+from _util import IronbotException, Immutable, compile_re, assert_raises
 
 
 def test_pop(params):
-    res = params[0]
-    del params[0]
-    return res
+    return params.take()
 
 
 def test_print(params):
@@ -41,7 +41,7 @@ def test_op(a, b):
     return a
 
 
-class AttributeOperation(object):
+class AttributeOperation(Immutable):
     """
     >>> o = AttributeOperation(test_op)
     >>> o.argc
@@ -49,11 +49,15 @@ class AttributeOperation(object):
     >>> obj=[1]; o(obj, 2); obj
     [1, 2]
     [1, 2]
+    >>> o == AttributeOperation(test_op)
+    True
     """
+    __slots__ = ('f', 'argc')
+
     def __init__(self, op):
-        self.argc = op.func_code.co_argcount - 1
-        assert self.argc >= 0
-        self.f = op
+        argc = op.func_code.co_argcount - 1
+        assert argc >= 0
+        self._init(f=op, argc=argc)
 
     def __call__(self, obj, *a):
         return self.f(obj, *a)
@@ -61,67 +65,433 @@ class AttributeOperation(object):
 
 
 class Attribute(object):
-    def __init__(self, name, default=None, **kw):
+    """
+    An attribute declaration. Its class attributes are registered later on (see AttributeDict.add_class_attr).
+    """
+    def __init__(self, name, default=None, cost=None, **kw):
         self.name = name
-        self.actions = kw
+        self.actions = dict([(k, tuple(v)) for k, v in kw.iteritems()])
         self.default = default
+        self.cost = cost
         self.class_attrs = {}
+        self.batch_attrs = {}
 
-    def find_class_attr(self, obj):
-        for t in type(obj).mro():
-            if t.__name__ in self.class_attrs:
-                return self.class_attrs[t.__name__]
-        return None
 
+class ClassAttribute(Immutable):
+    """
+    >>> ClassAttribute('list', get=test_print) == ClassAttribute('list', get=test_print)
+    True
+    """
+    __slots__ = ('class_name', 'actions', 'cost')
+
+    def __init__(self, class_name, cost=None, **kw):
+        self._init(class_name=class_name, cost=cost,
+                   actions=dict([(a, AttributeOperation(op)) for a, op in kw.iteritems()]))
 
-class ClassAttribute(object):
-    def __init__(self, class_name, **kw):
-        self.class_name = class_name
-        self.actions = kw
-        for a in self.actions:
-            self.actions[a] = AttributeOperation(self.actions[a])
+    def _fields(self):
+        return self.class_name, frozenset(self.actions.iteritems()), self.cost
 
 
 class AttributeDict(object):
+    """
+    >>> ad = AttributeDict()
+    >>> ad.add_attr('n', -1, get=())
+    >>> ad.add_class_attr('list', 'n', get=lambda x: len(x))
+    >>> ad.action([1, 2], 'n', 'get', []), ad.action({}, 'n', 'get', [])
+    (2, -1)
+    >>> sorted((n, t.__name__) for n, a, t in ad.dispatch)
+    [('n', 'dict'), ('n', 'list')]
+    >>> ad.add_class_attr('dict', 'n', get=lambda x: len(x) * 10)
+    >>> ad.action({1: 2}, 'n', 'get', [])
+    10
+    >>> ad.action_many([[1], {1: 2}, 'abc', []], 'n', 'get', [])
+    [1, 10, -1, 0]
+    >>> class list2(list): pass
+    >>> ad.add_class_attr('list2', 'n', wait=lambda x: True)
+    >>> ad.action(list2([1, 2]), 'n', 'get', [])
+    -1
+    >>> ad.add_attr('push', set=(test_pop,))
+    >>> ad.add_class_attr('list', 'push', set=lambda x, v: x.append(v) or x.append(len(x)))
+    >>> ad.add_class_attr('dict', 'push', set=lambda x, v: x.update({v: len(x)}))
+    >>> objs = [[], {}, [1]]; ad.action_many(objs, 'push', 'set', ['q']); objs
+    [None, None, None]
+    [['q', 1], {'q': 0}, [1, 'q', 2]]
+    >>> ad.filter_many([[1], [], {1: 2}], 'n', 'get', [])
+    [[1], {1: 2}]
+
+    A batch action answers for all of the objects of a type in one call (get and wait actions only, they
+    have no side effects). A failed batch gives the default for its objects, they are not re-run one by one:
+
+    >>> def batch_len(objs):
+    ...     print 'batch of', len(objs)
+    ...     return [len(o) for o in objs]
+    >>> ad.add_batch_attr('list', 'n', get=batch_len)
+    >>> ad.action_many([[1], {1: 2}, 'abc', [], [1, 2]], 'n', 'get', [])
+    batch of 3
+    [1, 10, -1, 0, 2]
+    >>> ad.action([1, 2, 3], 'n', 'get', [])
+    3
+    >>> ad.add_batch_attr('dict', 'n', get=lambda objs: [])
+    >>> ad.action_many([{1: 2}, [1], {}], 'n', 'get', [])
+    batch of 1
+    [-1, 1, -1]
+    >>> ATTR_FAILURES.counts[('n', 'IronbotException')]
+    1
+    >>> assert_raises(IronbotException, ad.add_batch_attr, 'list', 'push', set=lambda objs, v: None)
+    """
+    DEFAULT_COST = 1
+    #The actions a batch may answer for: they only read, so the order of the calls does not matter
+    BATCH_ACTIONS = ('get', 'wait')
+
     def __init__(self):
         self.attributes = {}
-
-    def add_attr(self, name, default=None, **kw):
-        self.attributes[name] = Attribute(name, default, **kw)
-
-    def add_class_attr(self, class_name, name, **kw):
+        self.version = 0
+        self.dispatch = {}
+        self.batch_dispatch = {}
+        self.costs = {}
+        self.measure_costs = False
+        self.measured_costs = {}
+
+    def _changed(self):
+        self.version += 1
+        self.dispatch.clear()
+        self.batch_dispatch.clear()
+        self.costs.clear()
+
+    def add_attr(self, name, default=None, cost=None, **kw):
+        """
+        :param cost: a relative cost hint for the actions of the attribute (DEFAULT_COST if not given),
+            filters are evaluated from the cheapest to the most expensive one.
+        """
+        self.attributes[name] = Attribute(name, default, cost, **kw)
+        self._changed()
+
+    def add_class_attr(self, class_name, name, cost=None, **kw):
+        """
+        :param cost: a cost hint for the class, overrides the one of the attribute.
+        """
         a = self.attributes[name]
-        a.class_attrs[class_name] = ClassAttribute(class_name, **kw)
+        a.class_attrs[class_name] = ClassAttribute(class_name, cost, **kw)
+        self._changed()
+
+    def add_batch_attr(self, class_name, name, **kw):
+        """
+        Registers batch actions of a class, the hook for the providers that can answer for many objects at once:
+        f(objs, *params) returns a list of results, one for each of the objects. Only the BATCH_ACTIONS may be
+        batched, and a batch action is used by action_many() (and so by the filters) only.
+        """
+        for action in kw:
+            if action not in self.BATCH_ACTIONS:
+                raise IronbotException("Attribute '%s': '%s' action cannot be batched" % (name, action))
+        a = self.attributes[name]
+        a.batch_attrs[class_name] = ClassAttribute(class_name, **kw)
+        self._changed()
 
     def read_params(self, name, action, args):
         a = self.attributes[name]
 
         return [pop_f(args) for pop_f in a.actions[action]]
 
-
-    """def get_action_function(self, name, action, params):
+    def resolve(self, name, action, obj_type):
+        """
+        :return: (function, default) for an attribute action on objects of the given type, the function is None
+            if the type has no such action. Results (including the negative ones) are cached until the next
+            add_attr() or add_class_attr().
+        """
+        key = (name, action, obj_type)
+        try:
+            return self.dispatch[key]
+        except KeyError:
+            pass
         a = self.attributes[name]
-        ca = a.find_class_attr(obj)
-        if ca:
-            def f(o):
-                try:
-                    return ca.actions[action](obj, *params)
-                except:
-                    return a.default
-            return f
-        return lambda _: a.default"""
-
+        f = None
+        for t in obj_type.mro():
+            ca = a.class_attrs.get(t.__name__, None)
+            if ca:
+                #The most derived class attribute decides, even if it lacks the action
+                op = ca.actions.get(action, None)
+                if op:
+                    f = op.f
+                else:
+                    logging.warning("Attribute '%s' has no '%s' action for '%s'" % (name, action, t.__name__))
+                break
+        self.dispatch[key] = res = (f, a.default)
+        return res
+
+    def resolve_batch(self, name, action, obj_type):
+        """
+        :return: The batch function for an attribute action on objects of the given type, or None. As in resolve(),
+            the most derived class with a class or a batch attribute decides.
+        """
+        key = (name, action, obj_type)
+        try:
+            return self.batch_dispatch[key]
+        except KeyError:
+            pass
+        a = self.attributes[name]
+        batch = None
+        if action in self.BATCH_ACTIONS:
+            for t in obj_type.mro():
+                ba = a.batch_attrs.get(t.__name__, None)
+                if ba or t.__name__ in a.class_attrs:
+                    op = ba and ba.actions.get(action, None)
+                    if op:
+                        batch = op.f
+                    break
+        self.batch_dispatch[key] = batch
+        return batch
+
+    def cost(self, name, obj_type):
+        """
+        :return: The cost of the attribute actions for the type: the measured one (if measure_costs is set
+            and there are measurements), otherwise the hint of the class attribute or of the attribute.
+        """
+        if self.measure_costs:
+            measured = self.measured_costs.get((name, obj_type), None)
+            if measured is not None:
+                return measured
+        key = (name, obj_type)
+        try:
+            return self.costs[key]
+        except KeyError:
+            pass
+        a = self.attributes[name]
+        cost = a.cost
+        for t in obj_type.mro():
+            ca = a.class_attrs.get(t.__name__, None)
+            if ca:
+                if ca.cost is not None:
+                    cost = ca.cost
+                break
+        if cost is None:
+            cost = self.DEFAULT_COST
+        self.costs[key] = cost
+        return cost
+
+    def measured(self, name, obj_type, seconds, count=1):
+        """
+        Accounts a measured evaluation time (an exponential moving average of the time per object is kept).
+        """
+        key = (name, obj_type)
+        per_obj = seconds / count
+        old = self.measured_costs.get(key, None)
+        self.measured_costs[key] = per_obj if old is None else old * 0.8 + per_obj * 0.2
+
+    def compile_filter(self, filters, action='wait'):
+        """
+        :param filters: a list of (attribute name, parameters), as parsed by robot_args.
+        :return: An AttributeFilter.
+        """
+        return AttributeFilter(self, filters, action)
+
+    def action_many(self, objs, name, action, params):
+        """
+        Performs an attribute action on a list of objects. The action is resolved once for each concrete type.
+        The objects of a type with a batch action are answered by one call of it, the rest are handled one by one
+        in the list order (the 'do' and 'set' actions have side effects).
+
+        :return: A list of results, one for each of the objects, in the list order.
+        """
+        resolved = {}
+        batches = {}
+        for i, o in enumerate(objs):
+            t = type(o)
+            if t not in resolved:
+                resolved[t] = self.resolve(name, action, t), self.resolve_batch(name, action, t)
+            if resolved[t][1] is not None:
+                batches.setdefault(t, []).append(i)
+        res = [None] * len(objs)
+        for t, idx in batches.iteritems():
+            (f, default), batch = resolved[t]
+            vals = _call_batch(batch, default, [objs[i] for i in idx], params, name)
+            for i, v in zip(idx, vals):
+                res[i] = v
+        for i, o in enumerate(objs):
+            (f, default), batch = resolved[type(o)]
+            if batch is None:
+                res[i] = default if f is None else _call(f, default, o, params, name)
+        return res
+
+    def filter_many(self, objs, name, action, params):
+        """
+        :return: The objects for which the action result is true.
+        """
+        return [o for o, ok in zip(objs, self.action_many(objs, name, action, params)) if ok]
 
     def action(self, obj, name, action, params):
-        #return self.get_action_function(name, action, params)(obj)
-        a = self.attributes[name]
-        ca = a.find_class_attr(obj)
-        if ca:
+        f, default = self.resolve(name, action, type(obj))
+        if f is None:
+            return default
+        return _call(f, default, obj, params, name)
+
+
+class AttributeFilter(object):
+    """
+    Attribute filters fused into one predicate: an object passes if all of the attribute actions are true for it.
+    The filters are evaluated from the cheapest to the most expensive one (see AttributeDict.cost), and the
+    evaluation stops at the first false one. A list is filtered stage by stage with AttributeDict.action_many,
+    so the batch actions answer for the objects still left.
+
+    >>> ad = AttributeDict()
+    >>> def chk(name, res):
+    ...     def f(obj, v):
+    ...         print name,
+    ...         return res(obj, v)
+    ...     return f
+    >>> ad.add_attr('slow', cost=100, wait=(test_pop,))
+    >>> ad.add_class_attr('list', 'slow', wait=chk('slow', lambda o, v: v in o))
+    >>> ad.add_attr('fast', wait=(test_pop,))
+    >>> ad.add_class_attr('list', 'fast', wait=chk('fast', lambda o, v: len(o) == v))
+    >>> f = ad.compile_filter([('slow', [1]), ('fast', [2])])
+    >>> [n for n, p in f.order(list)]
+    ['fast', 'slow']
+    >>> f.select([[1, 2], [3], [3, 4]])
+    fast fast fast slow slow
+    [[1, 2]]
+    >>> f([1, 2]), f([3])
+    fast slow fast
+    (True, False)
+    >>> ad.measure_costs = True
+    >>> ad.measured('slow', list, 0.001); ad.measured('fast', list, 0.002)
+    >>> [n for n, p in f.order(list)]
+    ['slow', 'fast']
+    """
+    def __init__(self, attr_dict, filters, action='wait'):
+        self.attr_dict = attr_dict
+        self.filters = list(filters)
+        self.action = action
+        self.orders = {}
+
+    def order(self, obj_type):
+        """
+        :return: The filters sorted by their cost for the type (stable, so the declaration order is kept for equal costs).
+        """
+        if not self.attr_dict.measure_costs:
             try:
-                return ca.actions[action](obj, *params)
-            except:
-                logging.warning(traceback.format_exc())
-        return a.default
+                return self.orders[obj_type]
+            except KeyError:
+                pass
+        cost = self.attr_dict.cost
+        res = sorted(self.filters, key=lambda (name, params): cost(name, obj_type))
+        self.orders[obj_type] = res
+        return res
+
+    def __call__(self, obj):
+        ad, action = self.attr_dict, self.action
+        measure = ad.measure_costs
+        for name, params in self.order(type(obj)):
+            f, default = ad.resolve(name, action, type(obj))
+            if measure:
+                t0 = monotonic()
+            ok = default if f is None else _call(f, default, obj, params, name)
+            if measure:
+                ad.measured(name, type(obj), monotonic() - t0)
+            if not ok:
+                return False
+        return True
+
+    def select(self, objs):
+        """
+        :return: The objects that pass all of the filters, in the list order.
+        """
+        objs = list(objs)
+        if not self.filters:
+            return objs
+        ad, action = self.attr_dict, self.action
+        measure = ad.measure_costs
+        groups = {}
+        for i, o in enumerate(objs):
+            groups.setdefault(type(o), []).append(i)
+        passed = set()
+        for t, idx in groups.iteritems():
+            for name, params in self.order(t):
+                if not idx:
+                    break
+                if measure:
+                    t0 = monotonic()
+                res = ad.action_many([objs[i] for i in idx], name, action, params)
+                if measure:
+                    ad.measured(name, t, monotonic() - t0, len(idx))
+                idx = [i for i, ok in zip(idx, res) if ok]
+            passed.update(idx)
+        return [o for i, o in enumerate(objs) if i in passed]
+
+
+class AttributeFailures(object):
+    """
+    Accounting of failed attribute actions: failures are counted per (attribute, exception type), only the first
+    traceback_limit tracebacks of each kind are formatted. report() logs a summary and starts over.
+
+    >>> fs = AttributeFailures(traceback_limit=1)
+    >>> for i in range(3):
+    ...     try: {}['q']
+    ...     except: fs.record('title')
+    >>> try: [][0]
+    ... except: fs.record('title')
+    >>> sorted(fs.counts.items()), len(fs.tracebacks[('title', 'KeyError')])
+    ([(('title', 'IndexError'), 1), (('title', 'KeyError'), 3)], 1)
+    >>> print fs.summary(tracebacks=False)
+    Failed attribute actions: 'title' IndexError x 1, 'title' KeyError x 3
+    >>> fs.report(); fs.counts
+    {}
+    """
+    TRACEBACK_LIMIT = 3
+
+    def __init__(self, traceback_limit=TRACEBACK_LIMIT):
+        self.traceback_limit = traceback_limit
+        self.counts = {}
+        self.tracebacks = {}
+
+    def record(self, name):
+        """
+        Records the exception being handled.
+        """
+        key = (name, sys.exc_info()[0].__name__)
+        n = self.counts.get(key, 0) + 1
+        self.counts[key] = n
+        if n <= self.traceback_limit:
+            if n == 1:
+                self.tracebacks[key] = []
+            self.tracebacks[key].append(traceback.format_exc())
+
+    def summary(self, tracebacks=True):
+        lines = ["Failed attribute actions: " + ', '.join(["'%s' %s x %d" % (k[0], k[1], n)
+                                                           for k, n in sorted(self.counts.items())])]
+        if tracebacks:
+            for k in sorted(self.tracebacks):
+                lines += self.tracebacks[k]
+        return '\n'.join(lines)
+
+    def reset(self):
+        self.counts = {}
+        self.tracebacks = {}
+
+    def report(self):
+        if self.counts:
+            logging.warning(self.summary())
+            self.reset()
+
+
+ATTR_FAILURES = AttributeFailures()
+
+
+def _call(f, default, obj, params, name):
+    try:
+        return f(obj, *params)
+    except:
+        ATTR_FAILURES.record(name)
+    return default
+
+
+def _call_batch(batch, default, objs, params, name):
+    try:
+        vals = batch(objs, *params)
+        if len(vals) != len(objs):
+            raise IronbotException("A batch action returned %d result(s) for %d object(s)" % (len(vals), len(objs)))
+        return vals
+    except:
+        ATTR_FAILURES.record(name)
+    return [default] * len(objs)
 
 
 def attr_checker(attr_name):
@@ -138,8 +508,7 @@ def attr_reader(attr_name):
 
 def re_checker(attr_name):
     def f(obj, val):
-        r = re.compile(val)
-        return r.match(my_getattr(obj, attr_name)) is not None
+        return compile_re(val).match(my_getattr(obj, attr_name)) is not None
     return f
 
 def my_getattr(obj, an):
@@ -0,0 +1,145 @@
+"""
+Automation backends: everything the keywords ask the desktop for goes through the current backend.
+
+WhiteBackend (_white) drives the real desktop through White and UI Automation, SimBackend (_simdesk) works on
+an in-memory simulated desktop, so that the keywords can run (and be benchmarked) anywhere, ProcBackend (_procfs)
+knows the processes of a Linux agent only. The objects a backend returns are dispatched by their type names
+(see AttributeDict), so the other ones are named after the White classes. IRONBOT_BACKEND in the environment
+selects the backend ('white' on Windows, 'proc' elsewhere by default).
+
+>>> from _simdesk import SimBackend, SimDesktop
+>>> old = set_backend(SimBackend(SimDesktop(windows=1, controls=3)))
+>>> w = get_backend().windows()[0]
+>>> [type(c).__name__ for c in get_backend().get_multiple(w, 'all', ())]
+['Button', 'TextBox', 'Label']
+>>> BackendProperties().read(w, 'Name')
+'Window 0'
+>>> set_backend(old) is not None
+True
+>>> assert_raises(IronbotException, load_backend, 'qt')
+"""
+from os import environ
+import sys
+
+from _util import IronbotException, assert_raises
+from _prefetch import PropertyProvider
+
+DEFAULT_BACKEND = 'white' if sys.platform in ('cli', 'win32') else 'proc'
+
+#name: (module, class)
+BACKENDS = {
+    'white': ('_white', 'WhiteBackend'),
+    'sim': ('_simdesk', 'SimBackend'),
+    'proc': ('_procfs', 'ProcBackend'),
+}
+
+
+class Backend(PropertyProvider):
+    """
+    The operations the keywords need from the desktop. By default the desktop is empty: a backend overrides
+    what it knows of, and defines launch(executable, params) and attach(process) returning an application
+    object. The property reads (fetch/read) are those of PropertyProvider.
+    """
+    #The names of the attributes get_multiple() can match exactly (see plan_query)
+    CRITERIA = ()
+
+    def watch_exit(self, app, notify):
+        """
+        Makes notify() called when the app exits.
+
+        :return: False if the exits cannot be reported.
+        """
+        return False
+
+    def processes(self):
+        return []
+
+    def windows(self, app=None, parent=None):
+        """
+        :return: The windows of the app, the modal windows of the parent, or the desktop windows.
+        """
+        return []
+
+    def get_multiple(self, parent, c_type, criteria):
+        """
+        :param c_type: a control type name (see the Ctl Get keyword), 'all' for any.
+        :param criteria: ((attribute name, value), ...), the names are those of CRITERIA.
+        :return: The matching descendants of the parent.
+        """
+        return []
+
+    def alive(self, parent, elements):
+        """
+        :return: False if some of the elements (a cheap check, not necessarily all of them) are gone.
+        """
+        return True
+
+    def element_key(self, element):
+        """
+        :return: A hashable identity of the element, None if it has none.
+        """
+        return None
+
+    def identity(self, obj):
+        """
+        :return: A hashable identity of a process ('pid', its pid, its start time), an application (that of its
+            process), a window or a control (its runtime id); None for the other objects. The start time is None
+            if it cannot be read, then a reused pid cannot be told from the process that had it before.
+        """
+        return None
+
+    def texts(self, parent):
+        """
+        :return: An iterator over the name of the parent and the texts of its labels and buttons.
+        """
+        return iter(())
+
+    def special_key(self, name):
+        """
+        :return: The keyboard value of a special key (e.g. 'RETURN').
+        """
+        return name
+
+    def event_source(self):
+        """
+        :return: An EventSource of the desktop events, None if there is none.
+        """
+        return None
+
+
+class BackendProperties(PropertyProvider):
+    """
+    The property reads of the current backend (the backend may be changed after a PropertyCache is made).
+    """
+    def fetch(self, root, elements, names):
+        return get_backend().fetch(root, elements, names)
+
+    def read(self, element, name):
+        return get_backend().read(element, name)
+
+
+def load_backend(name):
+    try:
+        module, cls = BACKENDS[name]
+    except KeyError:
+        raise IronbotException("Unknown backend '%s', known ones: %s" % (name, ', '.join(sorted(BACKENDS))))
+    return getattr(__import__(module, globals()), cls)()
+
+
+BACKEND = None
+
+
+def get_backend():
+    global BACKEND
+    if BACKEND is None:
+        BACKEND = load_backend(environ.get('IRONBOT_BACKEND', DEFAULT_BACKEND))
+    return BACKEND
+
+
+def set_backend(backend):
+    """
+    :return: The previous backend, to restore it later (None if none has been used yet).
+    """
+    global BACKEND
+    old, BACKEND = BACKEND, backend
+    return old
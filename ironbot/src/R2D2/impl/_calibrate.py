@@ -0,0 +1,136 @@
+"""
+Host calibration for benchmarked ('~') delays.
+
+A short busy loop is timed in-process and turned into a multiplier (1.0 for a fast computer, up to
+MAX_MULTIPLIER for a very slow one). The result is stored in a per-host cache file, so that
+the following suites just read it until the TTL expires.
+
+>>> import tempfile, shutil
+>>> from _util import get_function
+>>> d = tempfile.mkdtemp()
+>>> c = Calibration(join(d, 'c.json'), time_f=get_function((0.0, 0.05, 10.0, 10.02, 20.0, 20.03, 30.0)), runs=3)
+>>> c.load() is None
+True
+>>> c.multiplier()
+2.0
+>>> Calibration(c.path, time_f=lambda: 100.0).load()
+2.0
+>>> Calibration(c.path, time_f=lambda: 100.0 + CALIBRATION_TTL).load() is None
+True
+>>> shutil.rmtree(d)
+"""
+from os import makedirs, remove, rename
+from os.path import expanduser, join, isdir, dirname
+from time import time
+import json
+import logging
+import socket
+
+#A computer that runs ITERATION_TIME per busy loop iteration is a fast one (the multiplier is 1.0)
+ITERATION_TIME = 1e-7
+CALIBRATION_ITERATIONS = 100000
+CALIBRATION_RUNS = 3
+CALIBRATION_TTL = 24 * 3600.0
+CALIBRATION_DIR = join(expanduser('~'), '.ironbot')
+
+MIN_MULTIPLIER = 1.0
+MAX_MULTIPLIER = 5.0
+
+
+def busy_loop(n):
+    i = 0
+    while i < n:
+        i = i + 1
+
+
+def to_multiplier(elapsed, iterations):
+    """
+    >>> to_multiplier(0.001, 100000), to_multiplier(0.03, 100000), to_multiplier(1.0, 100000)
+    (1.0, 3.0, 5.0)
+    """
+    m = elapsed / (iterations * ITERATION_TIME)
+    return round(max(MIN_MULTIPLIER, min(MAX_MULTIPLIER, m)), 3)
+
+
+def default_path():
+    return join(CALIBRATION_DIR, 'calibration-%s.json' % socket.gethostname())
+
+
+class Calibration(object):
+    def __init__(self, path=None, ttl=CALIBRATION_TTL, iterations=CALIBRATION_ITERATIONS, runs=CALIBRATION_RUNS,
+                 time_f=time):
+        self.path = path or default_path()
+        self.ttl = ttl
+        self.iterations = iterations
+        self.runs = runs
+        self.time_f = time_f
+
+    def measure(self):
+        """
+        :return: The multiplier for the best of the busy loop runs.
+        """
+        best = None
+        for _ in range(self.runs):
+            t0 = self.time_f()
+            busy_loop(self.iterations)
+            elapsed = self.time_f() - t0
+            if best is None or elapsed < best:
+                best = elapsed
+        return to_multiplier(best, self.iterations)
+
+    def load(self):
+        """
+        :return: The cached multiplier or None if there is no valid one.
+        """
+        try:
+            f = open(self.path)
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+            if data.get('iterations') != self.iterations or not 0 <= self.time_f() - data['time'] < self.ttl:
+                return None
+            return float(data['multiplier'])
+        except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, multiplier):
+        data = {'multiplier': multiplier, 'time': self.time_f(), 'iterations': self.iterations,
+                'host': socket.gethostname()}
+        tmp = self.path + '.tmp'
+        try:
+            d = dirname(self.path)
+            if d and not isdir(d):
+                makedirs(d)
+            f = open(tmp, 'w')
+            try:
+                json.dump(data, f)
+            finally:
+                f.close()
+            try:
+                remove(self.path)
+            except OSError:
+                pass
+            rename(tmp, self.path)
+        except (IOError, OSError):
+            logging.warning("Cannot save the host calibration to '%s'" % self.path)
+
+    def multiplier(self):
+        m = self.load()
+        if m is None:
+            m = self.measure()
+            self.save(m)
+        return m
+
+
+HOST_MULTIPLIER = None
+
+
+def host_multiplier():
+    """
+    The multiplier for this host: calibrated once per process, cached across processes.
+    """
+    global HOST_MULTIPLIER
+    if HOST_MULTIPLIER is None:
+        HOST_MULTIPLIER = Calibration().multiplier()
+    return HOST_MULTIPLIER
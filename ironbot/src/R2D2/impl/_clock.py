@@ -0,0 +1,128 @@
+"""
+Clocks for the timeouts.
+
+The waits measure time with the current clock (see get_clock/set_clock). By default it is a monotonic wall clock,
+VirtualClock makes sleeping advance the simulated time instantly, so that the timeout-heavy tests run
+in no time. Setting IRONBOT_VIRTUAL_TIME in the environment starts the process with a virtual clock.
+
+>>> c = VirtualClock()
+>>> old = set_clock(c)
+>>> get_clock().now()
+0.0
+>>> get_clock().sleep(3600)
+>>> c.now(), c.sleeps
+(3600.0, 1)
+>>> set_clock(old) is c
+True
+>>> t0 = MonotonicClock().now(); MonotonicClock().now() >= t0
+True
+"""
+from os import environ
+import sys
+import threading
+import time
+
+
+def _monotonic_time():
+    """
+    :return: The best monotonic time function (seconds, float) for this platform.
+    """
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+    if sys.platform == 'cli':
+        try:
+            from System.Diagnostics import Stopwatch
+            frequency = float(Stopwatch.Frequency)
+            return lambda: Stopwatch.GetTimestamp() / frequency
+        except ImportError:
+            pass
+    if sys.platform == 'win32':
+        #QueryPerformanceCounter-based wall time on Windows
+        return time.clock
+    try:
+        import ctypes
+        import ctypes.util
+
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        CLOCK_MONOTONIC = 1
+        librt = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(timespec())) == 0:
+            def _monotonic():
+                ts = timespec()
+                clock_gettime(CLOCK_MONOTONIC, ctypes.byref(ts))
+                return ts.tv_sec + ts.tv_nsec * 1e-9
+            return _monotonic
+    except (ImportError, OSError, AttributeError, TypeError):
+        pass
+    return time.time
+
+
+monotonic = _monotonic_time()
+
+
+class MonotonicClock(object):
+    """
+    A clock has now() in seconds, sleep(seconds) and wait(condition, seconds) for a threading.Condition
+    held by the caller.
+    """
+    def now(self):
+        return monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, condition, seconds):
+        condition.wait(seconds)
+
+
+class VirtualClock(object):
+    """
+    Simulated time: sleeping and waiting return at once, moving the time forward.
+
+    >>> c = VirtualClock(10.0)
+    >>> cond = threading.Condition()
+    >>> _ = cond.acquire(); c.wait(cond, 2.5); cond.release()
+    >>> c.advance(0.5)
+    >>> c.now()
+    13.0
+    """
+    def __init__(self, start=0.0):
+        self.t = float(start)
+        self.sleeps = 0
+
+    def now(self):
+        return self.t
+
+    def advance(self, seconds):
+        self.t += max(0.0, seconds)
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.advance(seconds)
+
+    def wait(self, condition, seconds):
+        self.sleep(seconds)
+
+
+if environ.get('IRONBOT_VIRTUAL_TIME'):
+    CLOCK = VirtualClock()
+else:
+    CLOCK = MonotonicClock()
+
+
+def get_clock():
+    return CLOCK
+
+
+def set_clock(clock):
+    """
+    :return: The previous clock, to restore it later.
+    """
+    global CLOCK
+    old, CLOCK = CLOCK, clock
+    return old
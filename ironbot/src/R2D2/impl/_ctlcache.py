@@ -0,0 +1,149 @@
+"""
+A cache of the controls found in a parent window, so that repeated Ctl Get calls on the same window
+do not walk it again and again.
+
+The entries are keyed by the parent and the search criteria. An entry is reused only if the caller trusts it
+(trust=True): for a short TTL without UI events, or for the longer event TTL while the UI events epoch proves
+the parent has not changed since it was fetched (not every provider reports the structure changes, so the events
+alone are not enough). It is not reused if the cheap validation of its elements fails either. The cache holds
+at most max_elements elements, the least recently used entries are evicted first.
+
+>>> class Tree(object):
+...     walks = 0
+...     def __init__(self, *items):
+...         self.items = list(items)
+>>> def fetch(parent, criteria):
+...     Tree.walks += 1
+...     return [i for i in parent.items if criteria == 'all' or i.startswith(criteria)]
+>>> from _clock import VirtualClock
+>>> c, epoch = VirtualClock(), [None]
+>>> cache = ControlCache(fetch, epoch=lambda: epoch[0], ttl=1.0, event_ttl=30.0, max_elements=5, clock=c)
+>>> wnd = Tree('button1', 'button2', 'edit1')
+>>> cache.get(wnd, 'button'), cache.get(wnd, 'button'), cache.get(wnd, 'edit'), Tree.walks
+(['button1', 'button2'], ['button1', 'button2'], ['edit1'], 3)
+>>> cache.get(wnd, 'button', trust=True), Tree.walks
+(['button1', 'button2'], 3)
+>>> wnd.items.append('button3'); cache.get(wnd, 'button')
+['button1', 'button2', 'button3']
+>>> c.advance(2.0); cache.get(wnd, 'button', trust=True) and Tree.walks
+5
+>>> epoch[0] = 1; cache.get(wnd, 'button', trust=True) and Tree.walks
+6
+>>> c.advance(2.0); cache.get(wnd, 'button', trust=True) and Tree.walks
+6
+>>> cache.get(wnd, 'button') and Tree.walks
+7
+>>> cache.get(wnd, 'button', refresh=True, trust=True) and Tree.walks
+8
+>>> epoch[0] = 2; cache.get(wnd, 'button', trust=True) and Tree.walks
+9
+>>> cache.get(wnd, 'all'), cache.size, sorted([k[1] for k in cache.entries])
+(['button1', 'button2', 'edit1', 'button3'], 4, ['all'])
+>>> cache.validate = lambda parent, elements: False
+>>> cache.get(wnd, 'all', trust=True) and Tree.walks
+11
+"""
+from _clock import get_clock
+
+#A cached entry is reused only if the caller trusts it: for a short while only without UI events,
+#for longer while the events prove the parent unchanged
+CONTROL_CACHE_TTL = 1.0
+CONTROL_CACHE_EVENT_TTL = 30.0
+CONTROL_CACHE_MAX_ELEMENTS = 5000
+
+
+class _Entry(object):
+    __slots__ = ('elements', 'epoch', 'created', 'tick')
+
+    def __init__(self, elements, epoch, created, tick):
+        self.elements = elements
+        self.epoch = epoch
+        self.created = created
+        self.tick = tick
+
+
+class ControlCache(object):
+    """
+    :param fetch: fetch(parent, criteria) -> the controls found (an expensive walk of the parent).
+    :param key: key(parent) -> a key identifying the parent, None means the parent is not cached.
+    :param validate: validate(parent, elements) -> False if the cached elements cannot be reused.
+    :param epoch: epoch() -> a value that changes on structure changes, None if there are no UI events.
+    """
+    def __init__(self, fetch, key=id, validate=None, epoch=lambda: None, ttl=CONTROL_CACHE_TTL,
+                 event_ttl=CONTROL_CACHE_EVENT_TTL, max_elements=CONTROL_CACHE_MAX_ELEMENTS, clock=None):
+        self.fetch = fetch
+        self.key = key
+        self.validate = validate
+        self.epoch = epoch
+        self.ttl = ttl
+        self.event_ttl = event_ttl
+        self.max_elements = max_elements
+        self.clock = clock
+        self.entries = {}
+        self.size = 0
+        self.tick = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry, now, epoch, trust):
+        if not trust or entry.epoch != epoch:
+            return False
+        if epoch is None:
+            return now - entry.created < self.ttl
+        return now - entry.created < self.event_ttl
+
+    def get(self, parent, criteria, refresh=False, trust=False):
+        """
+        :param criteria: a hashable description of the search criteria, passed to fetch().
+        :param refresh: do not reuse the cached controls.
+        :param trust: reuse the cached controls: within the TTL, or within the event TTL if the UI events
+            show no changes of the parent. Otherwise the parent is always walked again.
+        :return: A new list of the controls.
+        """
+        pk = self.key(parent)
+        if pk is None:
+            return list(self.fetch(parent, criteria))
+        k = (pk, criteria)
+        now = (self.clock or get_clock()).now()
+        epoch = self.epoch()
+        self.tick += 1
+        entry = self.entries.get(k)
+        if entry is not None and not refresh and self._fresh(entry, now, epoch, trust) and \
+                (self.validate is None or self.validate(parent, entry.elements)):
+            self.hits += 1
+            entry.tick = self.tick
+            return list(entry.elements)
+        self.misses += 1
+        elements = list(self.fetch(parent, criteria))
+        self._drop(k)
+        self._store(k, _Entry(elements, epoch, now, self.tick))
+        return list(elements)
+
+    def _drop(self, k):
+        entry = self.entries.pop(k, None)
+        if entry is not None:
+            self.size -= len(entry.elements)
+
+    def _store(self, k, entry):
+        n = len(entry.elements)
+        if n > self.max_elements:
+            return
+        if self.size + n > self.max_elements:
+            for old_k, _ in sorted(self.entries.iteritems(), key=lambda kv: kv[1].tick):
+                self._drop(old_k)
+                if self.size + n <= self.max_elements:
+                    break
+        self.entries[k] = entry
+        self.size += n
+
+    def invalidate(self, parent=None):
+        """
+        Drops the entries of the parent, or all of them.
+        """
+        if parent is None:
+            self.entries = {}
+            self.size = 0
+            return
+        pk = self.key(parent)
+        for k in [k for k in self.entries if k[0] == pk]:
+            self._drop(k)
@@ -1,6 +1,9 @@
 from sys import argv, exit
 from os import  getcwd, chdir
 from os.path import dirname, abspath, basename
+from time import time
+import json
+import sys
 
 from robot.run import run
 
@@ -21,6 +24,75 @@ def main(exec_file, test, result_file):
     exit(0)
 
 
+FIND_WINDOW_KEYWORD = 'wnd get'
+
+
+def _children(item):
+    return list(getattr(item, 'suites', ())) + list(getattr(item, 'tests', ())) + \
+        list(getattr(item, 'body', None) or getattr(item, 'keywords', ()))
+
+
+def find_window_time(item):
+    """
+    :return: The elapsed time (seconds) of the first 'Wnd Get' keyword in a robot result, None if there is none.
+    """
+    name = getattr(item, 'name', None) or ''
+    if getattr(item, 'elapsedtime', None) is not None and name.split('.')[-1].strip().lower() == FIND_WINDOW_KEYWORD:
+        return item.elapsedtime / 1000.0
+    for c in _children(item):
+        res = find_window_time(c)
+        if res is not None:
+            return res
+    return None
+
+
+def run_test(suite, test, result_file):
+    """
+    Runs a single test of an already built suite.
+
+    :return: The telemetry record of the run, 'rc' is the robot return code, 0 if the test passed.
+    """
+    start = time()
+    s = suite.deepcopy()
+    s.filter(included_tests=[test])
+    result = s.run(output=None, stdout=sys.stderr, stderr=sys.stderr)
+    end = time()
+    if result_file != 'NONE':
+        from robot.reporting import ResultWriter
+        ResultWriter(result).write_results(report=result_file, log=None, output=None)
+    rc = result.return_code
+    return {'test': test, 'rc': rc, 'outcome': 'PASS' if rc == 0 else 'FAIL', 'start': start, 'end': end,
+            'find_window': find_window_time(result.suite)}
+
+
+def worker(exec_file):
+    """
+    Builds the handler suite once, then runs the tests requested on stdin, one JSON object per line
+    ({"test": ..., "result_file": ...}), and writes the telemetry records of the runs to stdout
+    ({"test": ..., "rc": ..., "outcome": ..., "start": ..., "end": ..., "find_window": ...}).
+    Everything robot prints goes to stderr, stdout is kept for the results.
+    """
+    from robot.running import TestSuiteBuilder
+    requests, results = sys.stdin, sys.stdout
+    sys.stdout = sys.stderr
+    chdir(dirname(abspath(exec_file)))
+    suite = TestSuiteBuilder().build(basename(exec_file))
+    for line in iter(requests.readline, ''):
+        request = json.loads(line)
+        start = time()
+        try:
+            record = run_test(suite, request['test'], request['result_file'])
+        except Exception:
+            import logging
+            from traceback import format_exc
+            logging.error(format_exc())
+            record = {'test': request['test'], 'rc': 1, 'outcome': 'ERROR', 'start': start, 'end': time()}
+        results.write(json.dumps(record) + '\n')
+        results.flush()
+
 
 if __name__ == "__main__":
-    main(argv[1], argv[2], argv[3])
+    if argv[1] == '--worker':
+        worker(argv[2])
+    else:
+        main(argv[1], argv[2], argv[3])
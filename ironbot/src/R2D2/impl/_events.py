@@ -0,0 +1,145 @@
+"""
+UI event notifications for the waiting keywords.
+
+Event sources (UI Automation in _white, the simulated desktop in _simdesk, FakeEventSource in tests) report
+what happened on the desktop to the EventHub, and a waiting keyword blocks on the hub until something it cares
+about happens, instead of re-querying the desktop every polling interval.
+
+>>> hub = EventHub()
+>>> src = FakeEventSource()
+>>> hub.subscribe(src)
+>>> hub.active
+True
+>>> stamp = hub.stamp(UI_EVENTS)
+>>> src.fire(PROCESS_EXITED)
+>>> hub.wait(stamp, 0.01, UI_EVENTS)
+False
+>>> src.fire(WINDOW_OPENED)
+>>> hub.wait(stamp, 0.01, UI_EVENTS)
+True
+>>> t = src.fire_later(0.05, PROCESS_EXITED)
+>>> hub.wait(hub.stamp(PROCESS_EVENTS), 10.0, PROCESS_EVENTS)
+True
+>>> t.join()
+>>> hub.unsubscribe_all()
+>>> hub.active, src.notify
+(False, None)
+"""
+import logging
+import threading
+
+from _clock import get_clock
+
+WINDOW_OPENED = 'window_opened'
+WINDOW_CLOSED = 'window_closed'
+STRUCTURE_CHANGED = 'structure_changed'
+PROPERTY_CHANGED = 'property_changed'
+PROCESS_EXITED = 'process_exited'
+MONITOR_CRASHED = 'monitor_crashed'
+
+EVENT_KINDS = (WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED, PROPERTY_CHANGED, PROCESS_EXITED, MONITOR_CRASHED)
+
+#The events a keyword waits for, by the kind of objects it watches. Any wait is woken by a crash
+#detected by the error monitors.
+CRASH_EVENTS = (MONITOR_CRASHED,)
+PROCESS_EVENTS = (PROCESS_EXITED, MONITOR_CRASHED)
+UI_EVENTS = (WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED, PROPERTY_CHANGED, MONITOR_CRASHED)
+ALL_EVENTS = EVENT_KINDS
+
+
+class EventSource(object):
+    """
+    The subscription of a backend: start() begins calling notify(kind) for the desktop events, stop() ends it.
+    By default the notify function is just kept, for the source to call it.
+    """
+    def __init__(self):
+        self.notify = None
+
+    def start(self, notify):
+        self.notify = notify
+
+    def stop(self):
+        self.notify = None
+
+
+class FakeEventSource(EventSource):
+    """
+    An in-memory event source: the events are fired by hand.
+    """
+    def fire(self, kind):
+        if self.notify:
+            self.notify(kind)
+
+    def fire_later(self, delay, kind):
+        t = threading.Timer(delay, self.fire, (kind,))
+        t.start()
+        return t
+
+
+class EventHub(object):
+    """
+    Counts the events by kind. A waiter takes a stamp of the counters it cares about before checking
+    the state, and then waits for the stamp to change, so no event is lost between the check and the wait.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.counts = dict([(k, 0) for k in EVENT_KINDS])
+        self.sources = []
+
+    @property
+    def active(self):
+        """
+        True if there is a live event source, so waiting for events makes sense.
+        """
+        return bool(self.sources)
+
+    def subscribe(self, source):
+        source.start(self.notify)
+        self.sources.append(source)
+
+    def unsubscribe_all(self):
+        sources, self.sources = self.sources, []
+        for s in sources:
+            try:
+                s.stop()
+            except Exception:
+                logging.warning('Cannot unsubscribe from UI events: %r' % s)
+
+    def notify(self, kind, *args):
+        """
+        Called by the event sources, possibly from their own threads. Extra arguments are ignored,
+        so the method may be used as an event handler directly.
+        """
+        self.cond.acquire()
+        try:
+            self.counts[kind] += 1
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+
+    def stamp(self, kinds=ALL_EVENTS):
+        counts = self.counts
+        return sum([counts[k] for k in kinds])
+
+    def wait(self, stamp, timeout, kinds=ALL_EVENTS, clock=None):
+        """
+        Blocks until one of the events of the given kinds happens after the stamp was taken, or the timeout
+        (in seconds) passes.
+
+        :return: True if there were events.
+        """
+        clock = clock or get_clock()
+        deadline = clock.now() + timeout
+        self.cond.acquire()
+        try:
+            while self.stamp(kinds) == stamp:
+                remaining = deadline - clock.now()
+                if remaining <= 0:
+                    return False
+                clock.wait(self.cond, remaining)
+            return True
+        finally:
+            self.cond.release()
+
+
+EVENTS = EventHub()
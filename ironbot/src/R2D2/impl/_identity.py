@@ -0,0 +1,68 @@
+"""
+Identity keys of the processes, windows and controls, so that the lists of them are compared through hashing
+instead of pairwise equality (which may cost a cross-process call per comparison). Two objects are the same
+if their keys are equal: for a process its pid and start time, for a window or a control its runtime id,
+whatever wrapper objects the backend has returned for them (see Backend.identity). The objects the backend
+knows nothing about are compared by value if hashable, otherwise by the object.
+
+>>> key = lambda v: v.lower() if isinstance(v, str) else None
+>>> exclude(['a', 'B', 'c', 3], ['b', 'C'], key)
+['a', 3]
+>>> l = [1]
+>>> dedup(['a', 'A', 3, 'b', 3, l, l, [1]], key)
+['a', 3, 'b', [1], [1]]
+>>> diff(['a', 'b', 'b'], ['B', 'c', 'd'], key)
+(['c', 'd'], ['a'])
+"""
+from _backend import get_backend
+
+
+def identity_key(obj, key=None):
+    """
+    :param key: key(obj) -> the identity the backend knows for the object, or None.
+    """
+    k = (key or get_backend().identity)(obj)
+    if k is not None:
+        return ('key', k)
+    try:
+        hash(obj)
+        return ('value', obj)
+    except TypeError:
+        return ('object', id(obj))
+
+
+def key_set(li, key=None):
+    key = key or get_backend().identity
+    return set([identity_key(v, key) for v in li])
+
+
+def exclude(li, excluded, key=None):
+    """
+    :return: The objects of li that are not in excluded (in the order of li).
+    """
+    key = key or get_backend().identity
+    drop = key_set(excluded, key)
+    return [v for v in li if identity_key(v, key) not in drop]
+
+
+def dedup(li, key=None):
+    """
+    :return: The objects of li without the repeated ones (the first ones are kept).
+    """
+    key = key or get_backend().identity
+    seen = set()
+    res = []
+    for v in li:
+        k = identity_key(v, key)
+        if k not in seen:
+            seen.add(k)
+            res.append(v)
+    return res
+
+
+def diff(old, new, key=None):
+    """
+    :return: (the objects of new that are not in old, the objects of old that are not in new), without repetitions.
+    """
+    key = key or get_backend().identity
+    return dedup(exclude(new, old, key), key), dedup(exclude(old, new, key), key)
@@ -1,12 +1,7 @@
 import logging
 
-try:
-    from White.Core.WindowsAPI.KeyboardInput import SpecialKeys
-except:
-    from traceback import format_exc
-    logging.error(format_exc())
-
-from _util import IronbotException
+from _backend import get_backend
+from _util import IronbotException, Immutable, assert_raises
 from _params import pop
 
 SPECIAL_KEYS = set((
@@ -18,10 +13,11 @@ SPECIAL_KEYS = set((
     'RIGHT', 'RIGHT_ALT', 'RWIN', 'SCROLL', 'SHIFT', 'SPACE', 'TAB'
 ))
 
-class SpecialKey(object):
+class SpecialKey(Immutable):
+    __slots__ = ('name', 'key')
+
     def __init__(self, name):
-        self.name = name
-        self.key = getattr(SpecialKeys, name)
+        self._init(name=name, key=get_backend().special_key(name))
 
     def hold(self, kbd):
         kbd.HoldKey(self.key)
@@ -34,10 +30,11 @@ class SpecialKey(object):
 
 
 
-class Key(object):
+class Key(Immutable):
+    __slots__ = ('name', 'key')
+
     def __init__(self, name):
-        self.name = name
-        self.key = name.upper()
+        self._init(name=name, key=name.upper())
 
     def hold(self, kbd):
         kbd.HoldKey(self.key)
@@ -49,23 +46,42 @@ class Key(object):
         kbd.Enter(self.key)
 
 
-class String(object):
+class String(Immutable):
+    __slots__ = ('v',)
+
     def __init__(self, v):
-        self.v = v
+        self._init(v=v)
 
     def enter(self, kbd):
         kbd.Enter(self.v)
 
 
+KEYS = {}
+
+
 def get_key(s):
+    """
+    Key objects are interned, the same name gives the same object.
+
+    >>> get_key('q') is get_key('q'), get_key('q') == Key('q'), get_key('q').key
+    (True, True, 'Q')
+    >>> assert_raises(IronbotException, get_key, 'qq')
+    """
+    try:
+        return KEYS[s]
+    except KeyError:
+        pass
     if s.upper() in SPECIAL_KEYS:
-        return SpecialKey(s.upper())
-    if len(s) == 1:
-        return Key(s)
-    raise IronbotException("Unknown key '%s'" % s)
+        k = SpecialKey(s.upper())
+    elif len(s) == 1:
+        k = Key(s)
+    else:
+        raise IronbotException("Unknown key '%s'" % s)
+    KEYS[s] = k
+    return k
 
 def pop_key(params):
     return get_key(pop(params))
 
 def pop_key_string(params):
-    return String(pop(params))
\ No newline at end of file
+    return String(pop(params))
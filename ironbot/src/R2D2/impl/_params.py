@@ -1,7 +1,6 @@
 import logging
-import re
 
-from _util import assert_raises, IronbotException, Delay
+from _util import assert_raises, IronbotException, Delay, LRUCache, compile_re, parse_polling
 from _attr import AttributeDict
 
 
@@ -10,33 +9,63 @@ class IronbotParametersException(IronbotException):
     pass
 
 
+class ArgStream(object):
+    """
+    A read-only cursor over keyword arguments, the arguments themselves are never copied.
+
+    >>> s = ArgStream(('a', 'b'))
+    >>> len(s), bool(s), s.take(), s
+    (2, True, 'a', ArgStream(('b',)))
+    >>> s.take(), len(s), bool(s), s
+    ('b', 0, False, ArgStream(()))
+    >>> assert_raises(IronbotParametersException, s.take)
+    """
+    __slots__ = ('args', 'pos')
+
+    def __init__(self, args, pos=0):
+        self.args = args
+        self.pos = pos
+
+    def __len__(self):
+        return len(self.args) - self.pos
+
+    def __nonzero__(self):
+        return self.pos < len(self.args)
+
+    def __repr__(self):
+        return 'ArgStream(%r)' % (tuple(self.args[self.pos:]),)
+
+    def take(self):
+        try:
+            p = self.args[self.pos]
+        except IndexError:
+            raise IronbotParametersException("Expected a parameter, found nothing")
+        self.pos += 1
+        return p
+
+
 def pop(params):
     """
-    >>> p = [1, 2, 3]
+    >>> p = ArgStream((1, 2, 3))
     >>> pop(p), p
-    (1, [2, 3])
+    (1, ArgStream((2, 3)))
     >>> pop(p), p
-    (2, [3])
+    (2, ArgStream((3,)))
     >>> pop(p), p
-    (3, [])
+    (3, ArgStream(()))
     >>> assert_raises(IronbotParametersException, pop, p)
     """
-    try:
-        p = params[0]
-    except IndexError:
-        raise IronbotParametersException("Expected a parameter, found nothing")
-    del params[0]
-    return p
+    return params.take()
 
 
 def pop_re(params):
     """
-    >>> bool(pop_re(['1']).match('1'))
+    >>> bool(pop_re(ArgStream(['1'])).match('1'))
     True
-    >>> bool(pop_re(['1']).match('0'))
+    >>> bool(pop_re(ArgStream(['1'])).match('0'))
     False
     """
-    return re.compile(pop(params))
+    return compile_re(pop(params))
 
 
 BOOL_VALS = {"TRUE": True, "FALSE": False}
@@ -51,11 +80,11 @@ def str_2_bool(s):
 
 def pop_bool(params):
     """
-    >>> pop_bool(['fAlSe'])
+    >>> pop_bool(ArgStream(['fAlSe']))
     False
-    >>> pop_bool(['TrUe'])
+    >>> pop_bool(ArgStream(['TrUe']))
     True
-    >>> try: pop_bool(['TrAlSe'])
+    >>> try: pop_bool(ArgStream(['TrAlSe']))
     ... except IronbotParametersException: print "YES!"
     YES!
     """
@@ -66,6 +95,19 @@ def pop_bool(params):
         raise IronbotParametersException("Expected a value of type bool, got '%s'" % s)
 
 
+def pop_polling(params):
+    """
+    >>> pop_polling(ArgStream(['backoff:5ms:500ms']))
+    BackoffPolling(Delay('0.005s'), Delay('0.5s'), 2, 0.1)
+    >>> assert_raises(IronbotParametersException, pop_polling, ArgStream(['sometimes']))
+    """
+    s = pop(params)
+    try:
+        return parse_polling(s)
+    except IronbotException, e:
+        raise IronbotParametersException(str(e))
+
+
 def pop_menu_path(params):
     res = []
     while params:
@@ -78,7 +120,7 @@ def pop_menu_path(params):
 
 def pop_type(type):
     """
-    >>> p = [1, ' 2.0 ', '', 's']
+    >>> p = ArgStream([1, ' 2.0 ', '', 's'])
     >>> pop_type(float)(p) == 1.0, pop_type(float)(p) == 2.0
     (True, True)
     >>> assert_raises(IronbotParametersException, pop_type(float), p)
@@ -94,19 +136,19 @@ def pop_type(type):
 
 def fixed_val(val):
     """
-    >>> p = [1, ' 2.0 ', '', 's']
+    >>> p = ArgStream([1, ' 2.0 ', '', 's'])
     >>> fixed_val(3)(p), p
-    (3, [1, ' 2.0 ', '', 's'])
+    (3, ArgStream((1, ' 2.0 ', '', 's')))
     """
     return lambda _: val
 
 
 def parse_positional(rules, param_list):
     """
-    >>> pl = ['a', 'b', '1']
+    >>> pl = ArgStream(('a', 'b', '1'))
     >>> rules = (pop, pop, pop_type(int))
     >>> parse_positional(rules, pl), pl
-    (['a', 'b', 1], [])
+    (['a', 'b', 1], ArgStream(()))
     """
     res = []
     for r in rules:
@@ -145,10 +187,10 @@ def parse_named(pdict, attr_dict, a, default_action='wait', insert_attr_dict=Fal
     >>> ad = AttributeDict()
     >>> ad.add_attr("attr1", 0, get=(pop_type(int),))
     >>> ad.add_class_attr("dict", "attr1", get=printer)
-    >>> assert parse_named(pd, ad, ['a'], 'get') == {'a1': 0}
-    >>> v = parse_named(pd, ad, ['a', 'b', '1s'], 'get'); assert fabs(v['b2'].value - 1) < 0.0001
+    >>> assert parse_named(pd, ad, ArgStream(['a']), 'get') == {'a1': 0}
+    >>> v = parse_named(pd, ad, ArgStream(['a', 'b', '1s']), 'get'); assert fabs(v['b2'].value - 1) < 0.0001
     >>> del v['b2']; assert v == {'a1': 0, 'b1': 0}
-    >>> p = parse_named(pd, ad, ['attr1', '2'], 'get'); p
+    >>> p = parse_named(pd, ad, ArgStream(['attr1', '2']), 'get'); p
     {'attributes': {'get': [('attr1', [2])]}}
     >>> ad.action({"attr1": 1}, 'attr1', 'get', p['attributes']['get'][0][1])
     {'attr1': 1}
@@ -156,7 +198,7 @@ def parse_named(pdict, attr_dict, a, default_action='wait', insert_attr_dict=Fal
     >>> ad = AttributeDict()
     >>> ad.add_attr("attr1", 0, get=(pop_type(int),), set=(pop,))
     >>> ad.add_class_attr("dict", "attr1", get=printer, set=printer)
-    >>> p = parse_named(pd, ad, ['set attr1', '2'], 'get'); p
+    >>> p = parse_named(pd, ad, ArgStream(['set attr1', '2']), 'get'); p
     {'attributes': {'set': [('attr1', ['2'])]}}
     """
     res = {}
@@ -187,8 +229,219 @@ def parse_named(pdict, attr_dict, a, default_action='wait', insert_attr_dict=Fal
 
 EMPTY_ATTRDICT = AttributeDict()
 
+PARSE_CACHE_SIZE = 256
+
+STRING_TYPES = frozenset((str, unicode))
+LITERAL_TYPES = frozenset((int, long, float, bool, type(None)))
+
+
+class _SlotTouched(Exception):
+    pass
+
+
+class _Slot(object):
+    """
+    Stands for a non-literal argument when a parse result is memoized. A rule that looks into
+    the value (not just passes it through) makes the call uncacheable.
+    """
+    __slots__ = ('idx',)
+
+    def __init__(self, idx):
+        self.idx = idx
+
+    def _touched(self, *a):
+        raise _SlotTouched()
+
+    __str__ = __unicode__ = __nonzero__ = __len__ = __iter__ = __hash__ = _touched
+    __eq__ = __ne__ = __cmp__ = __lt__ = __gt__ = __le__ = __ge__ = _touched
+    __int__ = __long__ = __float__ = __getitem__ = __contains__ = __call__ = _touched
+
+    def __getattr__(self, name):
+        raise _SlotTouched()
+
+
+_UNCACHEABLE = object()
+
+
+def _fill(v, args):
+    """
+    Copies a memoized parse result substituting slots with actual arguments.
+
+    >>> r = _fill({'a': [_Slot(1), ('x', [_Slot(0)])], 'b': 1}, ('q', 'w'))
+    >>> r == {'a': ['w', ('x', ['q'])], 'b': 1}
+    True
+    """
+    t = type(v)
+    if t is _Slot:
+        return args[v.idx]
+    if t is list:
+        return [_fill(i, args) for i in v]
+    if t is tuple:
+        return tuple([_fill(i, args) for i in v])
+    if t is dict:
+        return dict([(k, _fill(i, args)) for k, i in v.iteritems()])
+    return v
+
+
+def _nested_slots(v, depth=0):
+    t = type(v)
+    if t is _Slot:
+        return depth > 1
+    if t in (list, tuple):
+        return True in [_nested_slots(i, depth + 1) for i in v]
+    if t is dict:
+        return True in [_nested_slots(i, depth + 1) for i in v.itervalues()]
+    return False
+
+
+class _Memo(object):
+    """
+    A memoized parse result. Copying it is cheap for the usual case when slots are only found
+    among the keyword arguments themselves, not deeper (e.g. in attribute parameters).
+
+    >>> m = _Memo([_Slot(0), 'x'], {'a': _Slot(1), 'b': ['q'], 'attributes': {'get': [('n', [1])]}})
+    >>> m.fill(('o1', 'o2')) == (['o1', 'x'], {'a': 'o2', 'b': ['q'], 'attributes': {'get': [('n', [1])]}})
+    True
+    >>> m.fill(('o1', 'o2'))[1]['b'] is m.named['b']
+    False
+    """
+    __slots__ = ('fixed', 'named', 'fixed_slots', 'named_slots', 'named_lists', 'nested')
+
+    def __init__(self, fixed, named):
+        self.fixed = fixed
+        self.named = named
+        self.nested = _nested_slots(fixed) or _nested_slots(named)
+        self.fixed_slots = [(i, v.idx) for i, v in enumerate(fixed) if type(v) is _Slot]
+        self.named_slots = [(k, v.idx) for k, v in named.iteritems() if type(v) is _Slot]
+        self.named_lists = [k for k, v in named.iteritems() if type(v) is list]
+
+    def fill(self, args):
+        if self.nested:
+            return _fill(self.fixed, args), _fill(self.named, args)
+        fixed = list(self.fixed)
+        for i, idx in self.fixed_slots:
+            fixed[i] = args[idx]
+        named = dict(self.named)
+        for k, idx in self.named_slots:
+            named[k] = args[idx]
+        for k in self.named_lists:
+            named[k] = list(named[k])
+        attrs = named.get('attributes', None)
+        if attrs:
+            named['attributes'] = dict([(k, [(a, list(p)) for a, p in v]) for k, v in attrs.iteritems()])
+        return fixed, named
+
+
+class ParsePlan(object):
+    """
+    Keyword parameter rules compiled for parsing, plus a bounded cache of parse results keyed by
+    the literal arguments (the other arguments are passed through as is).
 
-def robot_args((pos, d), attr_dict=EMPTY_ATTRDICT, default_action='wait', insert_attr_dict=False):
+    >>> ad = AttributeDict()
+    >>> ad.add_attr("attr1", 0, get=(pop_type(int),))
+    >>> rules = ((pop, pop_type(int)), {'a': (('a1', fixed_val(0)),), 'b': (('b2', pop_type(Delay)),)})
+    >>> plan = ParsePlan(rules, ad, 'get')
+    >>> plan.parse(('x', '1', 'a', 'attr1', '10'))
+    (['x', 1], {'a1': 0, 'attributes': {'get': [('attr1', [10])]}})
+    >>> o = object()
+    >>> fixed, named = plan.parse((o, '2', 'get  attr1', '3'))
+    >>> fixed[0] is o, fixed[1], named
+    (True, 2, {'attributes': {'get': [('attr1', [3])]}})
+    >>> fixed, named = plan.parse((o, '2', 'get  attr1', '3'))
+    >>> fixed[0] is o, plan.cache.hits, plan.cache.misses
+    (True, 1, 2)
+    >>> named['attributes']['get'].append(None)
+    >>> plan.parse((o, '2', 'get  attr1', '3'))[1]
+    {'attributes': {'get': [('attr1', [3])]}}
+    >>> assert_raises(TypeError, plan.parse, ('x', o))
+    >>> assert_raises(IronbotParametersException, plan.parse, ('x', '1', 'attr2'))
+    >>> assert_raises(IronbotParametersException, plan.parse, ('x', '1', 'b', '1s', 'b', '2s'))
+    >>> ad.add_attr("attr2", 0, get=())
+    >>> plan.parse(('x', '1', 'attr2'))
+    (['x', 1], {'attributes': {'get': [('attr2', [])]}})
+    """
+    def __init__(self, rules, attr_dict=EMPTY_ATTRDICT, default_action='wait', insert_attr_dict=False,
+                 cache_size=PARSE_CACHE_SIZE):
+        pos, named = rules
+        self.positional = tuple(pos)
+        self.named = dict([(k, tuple(v)) for k, v in named.iteritems()])
+        self.attr_dict = attr_dict
+        self.default_action = default_action
+        self.insert_attr_dict = insert_attr_dict
+        self.cache = LRUCache(cache_size)
+        self.version = None
+        self.attr_tokens = {}
+
+    def compile(self):
+        tokens = {}
+        for name, a in self.attr_dict.attributes.iteritems():
+            for action, rules in a.actions.iteritems():
+                tokens['%s %s' % (action, name)] = (name, action, tuple(rules))
+            if self.default_action in a.actions:
+                tokens[name] = (name, self.default_action, tuple(a.actions[self.default_action]))
+        self.attr_tokens = tokens
+        self.cache.clear()
+        self.version = self.attr_dict.version
+
+    def parse(self, args):
+        if self.version != self.attr_dict.version:
+            self.compile()
+        key = tuple([v if type(v) in STRING_TYPES else
+                     ((type(v), v) if type(v) in LITERAL_TYPES else _Slot) for v in args])
+        res = self.cache.get(key)
+        if res is None:
+            res = self._memoize(key, args)
+        if res is _UNCACHEABLE:
+            return self._parse(args)
+        return res.fill(args)
+
+    def _memoize(self, key, args):
+        if _Slot not in key:
+            res = _Memo(*self._parse(args))
+        else:
+            try:
+                res = _Memo(*self._parse(tuple([_Slot(i) if k is _Slot else v for i, (k, v) in enumerate(zip(key, args))])))
+            except Exception:
+                res = _UNCACHEABLE
+        self.cache.put(key, res)
+        return res
+
+    def _parse(self, args):
+        params = ArgStream(args)
+        fixed = [r(params) for r in self.positional]
+        res = {}
+        while params:
+            name = pop(params)
+            rule = self.named.get(name, None)
+            if rule:
+                for rname, rproc in rule:
+                    if rname in res:
+                        raise IronbotParametersException("'%s' value is redefined by parameter '%s'" % (rname, name))
+                    res[rname] = rproc(params)
+                continue
+            token = self.attr_tokens.get(name, None)
+            if token:
+                attr, action, rules = token
+                vals = [r(params) for r in rules]
+            else:
+                try:
+                    attr, action = get_attr_and_action(name, self.default_action)
+                    if attr is None:
+                        raise IronbotParametersException("Attribute and action value cannot be parsed: '%s'" % name)
+                    vals = self.attr_dict.read_params(attr, action, params)
+                except KeyError:
+                    raise IronbotParametersException("Got an unknown attribute parameter: '%s'" % name)
+            if 'attributes' not in res:
+                res['attributes'] = {}
+            if action not in res['attributes']:
+                res['attributes'][action] = []
+            res['attributes'][action].append((attr, vals))
+        if self.insert_attr_dict:
+            res['attr_dict'] = self.attr_dict
+        return fixed, res
+
+
+def robot_args(rules, attr_dict=EMPTY_ATTRDICT, default_action='wait', insert_attr_dict=False):
     """
     >>> def f(*a, **kw): return a, kw
     >>> ad = AttributeDict()
@@ -207,13 +460,14 @@ def robot_args((pos, d), attr_dict=EMPTY_ATTRDICT, default_action='wait', insert
     >>> res = g('a', 'b', 1)
     >>> assert id(res[1]['attr_dict']) == id(ad)
     """
+    plan = ParsePlan(rules, attr_dict, default_action, insert_attr_dict)
+
     def decorator(f):
         def callable(*a):
-            params = list(a)
-            fixed = parse_positional(pos, params)
-            named = parse_named(d, attr_dict, params, default_action, insert_attr_dict)
+            fixed, named = plan.parse(a)
             return f(*fixed, **named)
         callable.__doc__ = f.__doc__
+        callable.parse_plan = plan
         return callable
     return decorator
 
@@ -0,0 +1,130 @@
+"""
+Batched property prefetch for the element attributes.
+
+Reading a property of a UI element is a cross-process round trip. A lookup keyword knows up front which
+properties its filters need, so it prefetches them for all of the candidate elements in one provider request;
+the attribute readers then take the values from the PropertyCache and only go to the provider for the rest.
+
+>>> class Element(object):
+...     def __init__(self, **props):
+...         self.__dict__.update(props)
+>>> provider = CountingProvider()
+>>> cache = PropertyCache(provider)
+>>> elements = [Element(Name='OK', AutomationId='b%d' % i) for i in range(10)]
+>>> check_name = prop_checker(cache, 'Name')
+>>> len([e for e in elements if check_name(e, 'OK')]), provider.round_trips
+(10, 10)
+>>> provider.round_trips = 0
+>>> cache.prefetch(None, elements, ('Name', 'AutomationId'))
+>>> len([e for e in elements if check_name(e, 'OK') and prop_re_checker(cache, 'AutomationId')(e, 'b[0-4]')])
+5
+>>> provider.round_trips, provider.fetched, prop_reader(cache, 'Missing')(elements[0]), provider.round_trips
+(1, 10, None, 2)
+>>> cache.clear(); prop_reader(cache, 'Name')(elements[0]), provider.round_trips
+('OK', 3)
+"""
+from _util import compile_re
+
+#A provider that cannot tell which elements of the root are the candidates fetches the whole root:
+#worth it only for this many candidates at least, a few are better read one by one
+FETCH_ALL_MIN_ELEMENTS = 8
+
+
+class PropertyProvider(object):
+    """
+    A property source: fetch() reads several properties of many elements in one request, read() reads a single
+    property of a single element. By default nothing is prefetched and the properties are Python attributes.
+    """
+    def fetch(self, root, elements, names):
+        """
+        :param root: the element the candidates were found in: the parent of the controls, the owner of
+            the modal windows, None for the desktop windows.
+        :return: A list of {property name: value} dicts, one for each of the elements (None if not fetched).
+        """
+        return [None for e in elements]
+
+    def read(self, element, name):
+        return getattr(element, name, None)
+
+
+class CountingProvider(PropertyProvider):
+    """
+    A stand-in provider over plain Python attributes, counting the round trips and the elements fetched.
+    """
+    def __init__(self):
+        self.round_trips = 0
+        self.fetched = 0
+
+    def fetch(self, root, elements, names):
+        self.round_trips += 1
+        self.fetched += len(elements)
+        return [dict([(n, getattr(e, n, None)) for n in names]) for e in elements]
+
+    def read(self, element, name):
+        self.round_trips += 1
+        return getattr(element, name, None)
+
+
+class PropertyCache(object):
+    """
+    Prefetched property values of the elements of a single lookup (the elements are identified by the
+    objects themselves, so the values must be cleared when the lookup is over).
+    """
+    def __init__(self, provider=None):
+        self.provider = provider
+        self.values = {}
+
+    def prefetch(self, root, elements, names):
+        if not names or not elements or self.provider is None:
+            return
+        try:
+            fetched = self.provider.fetch(root, elements, tuple(names))
+        except Exception:
+            return
+        for e, v in zip(elements, fetched):
+            if v is not None:
+                self.values[id(e)] = (e, v)
+
+    def read(self, element, name):
+        entry = self.values.get(id(element))
+        if entry is not None and entry[0] is element and name in entry[1]:
+            return entry[1][name]
+        return self.provider.read(element, name)
+
+    def clear(self):
+        self.values = {}
+
+
+def prop_reader(cache, name):
+    def f(obj):
+        return cache.read(obj, name)
+    return f
+
+
+def prop_checker(cache, name):
+    def f(obj, val):
+        return cache.read(obj, name) == val
+    return f
+
+
+def prop_re_checker(cache, name):
+    def f(obj, val):
+        v = cache.read(obj, name)
+        return v is not None and compile_re(val).match(v) is not None
+    return f
+
+
+def needed_properties(filters, properties):
+    """
+    :param filters: a list of (attribute name, parameters).
+    :param properties: {attribute name: (property name, ...)}.
+    :return: The property names the filters read.
+
+    >>> sorted(needed_properties([('name', ['a']), ('re_name', ['b']), ('enabled', []), ('click', [])],
+    ...                          {'name': ('Name',), 're_name': ('Name',), 'enabled': ('IsEnabled',)}))
+    ['IsEnabled', 'Name']
+    """
+    res = set()
+    for name, _ in filters:
+        res.update(properties.get(name, ()))
+    return res
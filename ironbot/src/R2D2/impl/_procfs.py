@@ -0,0 +1,217 @@
+"""
+Processes read from /proc (Linux), lazily: listing the processes reads the directory only, and each field
+of a process is read on the first access, so a filter reads the fields it checks and nothing else.
+
+>>> import tempfile, shutil
+>>> root = tempfile.mkdtemp()
+>>> fake_process(root, 1, 'init', ['/sbin/init'], start=5)
+>>> fake_process(root, 4242, 'my (app)', ['/opt/my app', '--x'], start=1000)
+>>> source = ProcSource(root)
+>>> procs = source.processes()
+>>> [p.Id for p in procs], source.reads
+([1, 4242], 0)
+>>> [p.ProcessName for p in procs], source.reads
+(['init', 'my (app)'], 2)
+>>> procs[1].CommandLine, procs[1].StartTime, procs[1].MainWindowTitle, procs[1].HasExited
+('/opt/my app --x', 1000, '', False)
+>>> fake_process(root, 4242, 'other', ['/bin/other'], start=2000)
+>>> procs[1].HasExited, ProcSource(root).processes()[1].ProcessName
+(True, 'other')
+>>> fake_process(root, 1, 'init', ['/sbin/init'], start=5, state='Z'); procs[0].HasExited
+True
+>>> fake_process(root, 4242, 'my (app)', ['/opt/my app', '--x'], start=1000)
+>>> app = ProcBackend(source).attach(source.processes()[1])
+>>> fake_process(root, 4242, 'other', ['/bin/other'], start=2000)
+>>> app.HasExited, app.Process.StartTime
+(True, 1000)
+>>> shutil.rmtree(join(root, '1'))
+>>> source.process(1).pin().HasExited
+True
+>>> assert_raises(ProcessExited, getattr, source.process(1), 'ProcessName')
+>>> ProcBackend(source).identity(source.process(1)), ProcBackend(source).identity(source.process(4242))
+(('pid', 1, None), ('pid', 4242, 2000))
+>>> shutil.rmtree(root)
+>>> not isdir('/proc') or getpid() in [p.Id for p in ProcSource().processes()]
+True
+"""
+from os import listdir, getpid, kill, makedirs
+from os.path import join, isdir
+import shlex
+import signal
+import subprocess
+
+from _backend import Backend
+from _util import IronbotException, assert_raises
+
+PROC_ROOT = '/proc'
+#The index of the start time (field 22 of stat) among the fields after the process name
+STAT_START_TIME = 19
+EXITED_STATES = ('Z', 'X')
+
+
+class ProcessExited(IronbotException):
+    pass
+
+
+class ProcSource(object):
+    """
+    The processes of a /proc file system, read through open/read only.
+    """
+    def __init__(self, root=PROC_ROOT):
+        self.root = root
+        self.reads = 0
+
+    def pids(self):
+        for name in listdir(self.root):
+            if name.isdigit():
+                yield int(name)
+
+    def processes(self):
+        return [Process(self, pid) for pid in sorted(self.pids())]
+
+    def process(self, pid):
+        return Process(self, pid)
+
+    def read(self, pid, name):
+        self.reads += 1
+        try:
+            with open(join(self.root, str(pid), name), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            raise ProcessExited('Process %d has exited' % pid)
+
+    def stat(self, pid):
+        """
+        :return: The fields of /proc/<pid>/stat after the process name (the name may have spaces and parentheses).
+        """
+        s = self.read(pid, 'stat')
+        return s[s.rindex(')') + 2:].split()
+
+
+class Process(object):
+    """
+    A process (named as the .NET class, for the attribute dispatch), its fields are read on demand and kept.
+    """
+    def __init__(self, source, pid):
+        self.source = source
+        self.Id = pid
+        self.fields = {}
+
+    def __repr__(self):
+        return '<Process %d>' % self.Id
+
+    def _field(self, name, read):
+        try:
+            return self.fields[name]
+        except KeyError:
+            v = self.fields[name] = read()
+            return v
+
+    @property
+    def ProcessName(self):
+        return self._field('name', lambda: self.source.read(self.Id, 'comm').rstrip('\n'))
+
+    @property
+    def CommandLine(self):
+        return self._field('cmdline', lambda: ' '.join(self.source.read(self.Id, 'cmdline').rstrip('\0').split('\0')))
+
+    @property
+    def StartTime(self):
+        return self._field('start', lambda: int(self.source.stat(self.Id)[STAT_START_TIME]))
+
+    def pin(self):
+        """
+        Records the start time now: from here on HasExited is true if the pid gets reused.
+
+        :return: self.
+        """
+        try:
+            self.StartTime
+        except ProcessExited:
+            self.fields['start'] = None
+        return self
+
+    @property
+    def MainWindowTitle(self):
+        """
+        No windows here.
+        """
+        return ''
+
+    @property
+    def HasExited(self):
+        """
+        Also true if the pid has been reused by another process since the start time was recorded (see pin).
+        """
+        try:
+            stat = self.source.stat(self.Id)
+        except ProcessExited:
+            return True
+        start = self._field('start', lambda: int(stat[STAT_START_TIME]))
+        return start is None or stat[0] in EXITED_STATES or int(stat[STAT_START_TIME]) != start
+
+
+class Application(object):
+    """
+    A launched or attached process: what App State and the teardowns need from a White application.
+    """
+    def __init__(self, process, popen=None):
+        self.Process = process
+        self.popen = popen
+
+    @property
+    def HasExited(self):
+        if self.popen is not None:
+            return self.popen.poll() is not None
+        return self.Process.HasExited
+
+    def GetWindows(self):
+        return []
+
+    def Dispose(self):
+        if self.HasExited:
+            return
+        try:
+            kill(self.Process.Id, signal.SIGKILL)
+        except OSError:
+            pass
+        if self.popen is not None:
+            self.popen.wait()
+
+
+class ProcBackend(Backend):
+    """
+    Processes only: for the agents without a desktop (the window and control lookups find nothing).
+    """
+    def __init__(self, source=None):
+        self.source = source or ProcSource()
+
+    def launch(self, executable, params):
+        popen = subprocess.Popen([executable] + shlex.split(params or ''))
+        return Application(self.source.process(popen.pid).pin(), popen)
+
+    def attach(self, process):
+        return Application(process.pin())
+
+    def processes(self):
+        return self.source.processes()
+
+    def identity(self, obj):
+        if isinstance(obj, Application):
+            obj = obj.Process
+        if isinstance(obj, Process):
+            return ('pid', obj.Id, obj.pin().StartTime)
+        return None
+
+
+def fake_process(root, pid, name, cmdline, start=0, state='S'):
+    """
+    Writes the /proc files of a process under root (for the tests).
+    """
+    d = join(root, str(pid))
+    if not isdir(d):
+        makedirs(d)
+    for fname, content in (('comm', name + '\n'), ('cmdline', '\0'.join(cmdline) + '\0'),
+                           ('stat', '%d (%s) %s %s %d 0 0\n' % (pid, name, state, ' '.join(['0'] * 18), start))):
+        with open(join(d, fname), 'wb') as f:
+            f.write(content)
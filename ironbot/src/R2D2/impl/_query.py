@@ -0,0 +1,45 @@
+"""
+A small query planner for the control lookups: exact-match 'wait' filters that the automation provider can
+evaluate itself are pushed down into the native search criteria, only the rest is checked in Python.
+
+>>> plan = plan_query([('automation_id', ['AID_Button1']), ('enabled', []), ('re_name', ['^OK'])],
+...                   ('automation_id', 'id', 'text'))
+>>> plan.native, plan.residual
+((('automation_id', 'AID_Button1'),), [('enabled', []), ('re_name', ['^OK'])])
+>>> plan_query([('automation_id', ['AID_Button1'])], ('automation_id',), pushdown=False).native
+()
+>>> plan_query([('automation_id', [None]), ('id', ['a', 'b'])], ('automation_id', 'id')).native
+()
+"""
+from _util import Immutable
+
+STRING_TYPES = (str, unicode)
+
+
+class QueryPlan(Immutable):
+    """
+    native: ((attribute name, value), ...) for the provider, residual: the filters left for Python.
+    """
+    __slots__ = ('native', 'residual')
+
+    def __init__(self, native, residual):
+        self._init(native=native, residual=residual)
+
+    def __repr__(self):
+        return 'QueryPlan(%r, %r)' % (self.native, self.residual)
+
+
+def plan_query(filters, pushable, pushdown=True):
+    """
+    :param filters: a list of (attribute name, parameters) 'wait' filters, as parsed by robot_args.
+    :param pushable: the names of the attributes the provider can match exactly (a single string value).
+    :param pushdown: False keeps all of the filters in Python (e.g. when there is no parent to search in).
+    :return: A QueryPlan. The native part is hashable, so it may be a part of a cache key.
+    """
+    native, residual = [], []
+    for name, params in filters:
+        if pushdown and name in pushable and len(params) == 1 and isinstance(params[0], STRING_TYPES):
+            native.append((name, params[0]))
+        else:
+            residual.append((name, params))
+    return QueryPlan(tuple(native), residual)
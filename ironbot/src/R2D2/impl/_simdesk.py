@@ -0,0 +1,608 @@
+"""
+A simulated desktop: processes, applications, windows and controls in memory, for running the keywords
+(and benchmarking them) without a real desktop.
+
+The classes are named after the White ones, so the attribute dispatch treats them the same way. Every call
+that would be a cross-process round trip on a real desktop (a property read, a search, a listing) costs
+`latency` seconds of the current clock and is counted in `calls`. A bulk call (a property cache request)
+costs `item_latency` more for each element it goes through, counted in `items`. The changes fire the events
+a real desktop would.
+
+>>> from _clock import VirtualClock, set_clock
+>>> old = set_clock(VirtualClock())
+>>> desk = SimDesktop(apps=1, windows=2, controls=10, latency=0.001, item_latency=0.0001)
+>>> backend = SimBackend(desk)
+>>> [w.Name for w in backend.windows()]
+['Window 0', 'Window 1']
+>>> w = backend.windows()[0]
+>>> buttons = backend.get_multiple(w, 'button', ())
+>>> [b.Name for b in buttons], backend.read(buttons[1], 'AutomationId')
+(['Button 0', 'Button 5'], 'ctl_0_5')
+>>> [b.Name for b in backend.get_multiple(w, 'all', (('automation_id', 'ctl_0_3'),))]
+['CheckBox 3']
+>>> desk.calls = 0
+>>> values = backend.fetch(w, buttons, ('Name', 'IsEnabled'))
+>>> values[1]['Name'], desk.calls, desk.items, get_clock().now() > 0
+('Button 5', 1, 2, True)
+>>> modal = desk.open_window(desk.apps[0], 'Modal', controls=0, owner=w)
+>>> backend.fetch(w, [modal], ('Name',)), backend.fetch(None, [modal], ('Name',))
+([{'Name': 'Modal'}], [None])
+>>> big = SimDesktop(windows=1, controls=1000, fanout=10)
+>>> wnd = big.windows[0]
+>>> len(SimBackend(big).get_multiple(wnd, 'all', ())) > 1000, max(len(e.children) for e in wnd.descendants())
+(True, 10)
+>>> panels = [e for e in wnd.descendants() if isinstance(e, Panel)]
+>>> fetch = SimBackend(big).fetch; big.calls = 0
+>>> fetch(wnd, panels[:2], ('Name',)), big.calls
+([None, None], 0)
+>>> len([v for v in fetch(wnd, panels, ('Name',)) if v]) == len(panels), big.calls, big.items > 1000
+(True, 1, True)
+>>> from _events import EventHub, WINDOW_CLOSED
+>>> hub = EventHub(); hub.subscribe(desk.events); stamp = hub.stamp((WINDOW_CLOSED,))
+>>> w.Close()
+>>> hub.wait(stamp, 0.0, (WINDOW_CLOSED,)), w.IsClosed, len(backend.windows())
+(True, True, 1)
+>>> assert_raises(ElementNotAvailable, backend.get_multiple, w, 'all', ())
+>>> app = desk.apps[0]; app.Dispose()
+>>> app.HasExited, backend.processes()
+(True, [])
+>>> hub.unsubscribe_all(); _ = set_clock(old)
+"""
+from itertools import count
+from os.path import basename, splitext
+
+from _backend import Backend
+from _clock import get_clock
+from _events import FakeEventSource, WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED, PROPERTY_CHANGED
+from _events import PROCESS_EXITED
+from _prefetch import FETCH_ALL_MIN_ELEMENTS
+from _snapshot import labels_first
+from _util import assert_raises
+
+FIRST_PID = 1000
+DEFAULT_FANOUT = 20
+#Runtime ids are unique across the desktops, as the real ones are across the processes
+RUNTIME_IDS = count(1)
+#The process start times (ticks), unique as well
+START_TIMES = count(1)
+
+
+class ElementNotAvailable(Exception):
+    """
+    The element is gone (the White/UI Automation counterpart is ElementNotAvailableException).
+    """
+
+
+class SimElement(object):
+    def __init__(self, desktop, name, automation_id='', parent=None):
+        self.desktop = desktop
+        self.props = {'Name': name, 'AutomationId': automation_id, 'IsEnabled': True}
+        self.parent = parent
+        self.children = []
+        self.runtime_id = desktop.next_id()
+        self.removed = False
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.props['Name'])
+
+    def get(self, name):
+        self.desktop.call()
+        if self.removed:
+            raise ElementNotAvailable(repr(self))
+        return self.props.get(name)
+
+    def set(self, name, value):
+        self.desktop.call()
+        self.props[name] = value
+        self.desktop.fire(PROPERTY_CHANGED)
+
+    def descendants(self):
+        """
+        The descendants in document order (not a round trip: the simulated calls are made by the callers).
+        """
+        stack = list(reversed(self.children))
+        while stack:
+            e = stack.pop()
+            yield e
+            stack.extend(reversed(e.children))
+
+    def has_ancestor(self, root):
+        p = self.parent
+        while p is not None:
+            if p is root:
+                return True
+            p = p.parent
+        return False
+
+    Name = property(lambda self: self.get('Name'))
+    Id = property(lambda self: self.get('AutomationId'))
+    Enabled = property(lambda self: self.get('IsEnabled'))
+
+
+class UIItem(SimElement):
+    def __init__(self, *a, **kw):
+        SimElement.__init__(self, *a, **kw)
+        self.clicks = 0
+
+    def Click(self):
+        self.desktop.call()
+        self.clicks += 1
+
+    def DoubleClick(self):
+        self.Click()
+        self.clicks += 1
+
+    def RightClick(self):
+        self.desktop.call()
+
+    def Visible(self):
+        return not self.get('IsOffscreen')
+
+    def Focus(self):
+        self.desktop.call()
+        self.desktop.focus = self
+
+    @property
+    def IsFocussed(self):
+        self.desktop.call()
+        return self.desktop.focus is self
+
+
+class Panel(UIItem):
+    pass
+
+
+class Button(UIItem):
+    pass
+
+
+class Label(UIItem):
+    pass
+
+
+class TextBox(UIItem):
+    def _set_text(self, v):
+        self.set('Value', v)
+
+    Text = property(lambda self: self.get('Value') or '', _set_text)
+
+
+class CheckBox(UIItem):
+    def Click(self):
+        UIItem.Click(self)
+        self.set('Checked', not self.props.get('Checked'))
+
+    Checked = property(lambda self: bool(self.get('Checked')))
+
+
+class RadioButton(UIItem):
+    def Click(self):
+        UIItem.Click(self)
+        for e in self.parent.children:
+            if isinstance(e, RadioButton):
+                e.props['Checked'] = e is self
+        self.desktop.fire(PROPERTY_CHANGED)
+
+    IsSelected = property(lambda self: bool(self.get('Checked')))
+
+
+class ListItem(UIItem):
+    Text = property(lambda self: self.get('Name'))
+
+    def Select(self):
+        self.parent.Select(self.props['Name'])
+
+
+class ListBox(UIItem):
+    @property
+    def Items(self):
+        self.desktop.call()
+        return [e for e in self.children if isinstance(e, ListItem)]
+
+    @property
+    def SelectedItem(self):
+        return self.get('Selected')
+
+    def Select(self, item):
+        items = self.Items
+        if isinstance(item, (int, long)):
+            item = items[item]
+        else:
+            item = [i for i in items if i.props['Name'] == item][0]
+        self.set('Selected', item)
+
+
+#Never generated: the searches for those types find nothing, as on a desktop without them
+class MenuBar(UIItem):
+    pass
+
+
+class ToolStrip(UIItem):
+    pass
+
+
+class Tab(UIItem):
+    pass
+
+
+class Tree(UIItem):
+    pass
+
+
+class TreeNode(UIItem):
+    pass
+
+
+class AttachedKeyboard(object):
+    def __init__(self, window):
+        self.window = window
+
+    def _key(self, op, key):
+        self.window.desktop.call()
+        self.window.desktop.typed.append((op, key))
+
+    def HoldKey(self, key):
+        self._key('hold', key)
+
+    def LeaveKey(self, key):
+        self._key('leave', key)
+
+    def PressSpecialKey(self, key):
+        self._key('press', key)
+
+    def Enter(self, s):
+        self._key('enter', s)
+        focus = self.window.desktop.focus
+        if isinstance(focus, TextBox):
+            focus.props['Value'] = (focus.props.get('Value') or '') + s
+
+
+class Window(UIItem):
+    def __init__(self, desktop, name, automation_id='', app=None, owner=None):
+        UIItem.__init__(self, desktop, name, automation_id)
+        self.app = app
+        self.owner = owner
+        self.modals = []
+
+    @property
+    def IsClosed(self):
+        self.desktop.call()
+        return self.removed
+
+    @property
+    def IsActive(self):
+        self.desktop.call()
+        return self.desktop.active is self
+
+    def Close(self):
+        self.desktop.call()
+        self.desktop.close_window(self)
+
+    def WaitWhileBusy(self):
+        self.desktop.call()
+
+    def ModalWindows(self):
+        self.desktop.call()
+        return [w for w in self.modals if not w.removed]
+
+    @property
+    def Keyboard(self):
+        return AttachedKeyboard(self)
+
+    @property
+    def MenuBar(self):
+        self.desktop.call()
+        for e in self.children:
+            if isinstance(e, MenuBar):
+                return e
+        return None
+
+
+class Process(object):
+    def __init__(self, desktop, pid, name):
+        self.desktop = desktop
+        self.Id = pid
+        self.ProcessName = name
+        self.StartTime = next(START_TIMES)
+        self.app = None
+        self.exited = False
+
+    def __repr__(self):
+        return '<Process %d %s>' % (self.Id, self.ProcessName)
+
+    @property
+    def HasExited(self):
+        self.desktop.call()
+        return self.exited
+
+    @property
+    def MainWindowTitle(self):
+        self.desktop.call()
+        for w in self.app.windows:
+            if not w.removed:
+                return w.props['Name']
+        return ''
+
+
+class Application(object):
+    def __init__(self, desktop, process):
+        self.desktop = desktop
+        self.Process = process
+        self.windows = []
+        process.app = self
+
+    @property
+    def HasExited(self):
+        return self.Process.HasExited
+
+    def GetWindows(self):
+        self.desktop.call()
+        return [w for w in self.windows if not w.removed]
+
+    def Dispose(self):
+        self.desktop.call()
+        self.desktop.kill(self)
+
+
+#The classes with no control type of their own (see SimBackend.fetch)
+UNTYPED = set([SimElement, UIItem, Panel])
+
+#The generated controls, in turn
+CONTROL_KINDS = (Button, TextBox, Label, CheckBox, RadioButton)
+
+#Ctl Get control type names
+CONTROL_TYPES = {
+    'all': None,
+    'button': Button,
+    'edit': TextBox,
+    'menu': MenuBar,
+    'list': ListBox,
+    'listitem': ListItem,
+    'radio': RadioButton,
+    'radiobutton': RadioButton,
+    'checkbox': CheckBox,
+    'tab': Tab,
+    'tree': Tree,
+    'treenode': TreeNode,
+    'toolbar': ToolStrip,
+}
+
+#Ctl Get native criteria: attribute name -> property
+CRITERIA_PROPERTIES = {
+    'text': 'Name',
+    'automation_id': 'AutomationId',
+    'id': 'AutomationId',
+}
+
+
+class SimDesktop(object):
+    """
+    :param apps: the number of the applications running from the start.
+    :param windows: the number of the windows of each application.
+    :param controls: the number of the controls in each window.
+    :param fanout: the maximal number of the children of an element, the controls are nested in panels
+        to keep to it (so a big window makes a deep tree).
+    :param latency: the cost of a call in seconds (of the current clock).
+    :param item_latency: the extra cost of a bulk call for each element it goes through.
+    """
+    def __init__(self, apps=1, windows=1, controls=10, fanout=DEFAULT_FANOUT, latency=0.0, item_latency=0.0):
+        self.window_count = windows
+        self.control_count = controls
+        self.fanout = max(2, fanout)
+        self.latency = latency
+        self.item_latency = item_latency
+        self.calls = 0
+        self.items = 0
+        self.last_pid = FIRST_PID
+        self.window_total = 0
+        self.processes = []
+        self.apps = []
+        self.windows = []
+        self.active = None
+        self.focus = None
+        self.typed = []
+        self.events = FakeEventSource()
+        for i in range(apps):
+            self.launch('app%d.exe' % i)
+
+    def call(self, items=0):
+        """
+        :param items: the number of the elements a bulk call goes through.
+        """
+        self.calls += 1
+        self.items += items
+        cost = self.latency + items * self.item_latency
+        if cost:
+            get_clock().sleep(cost)
+
+    def fire(self, kind):
+        self.events.fire(kind)
+
+    def next_id(self):
+        return next(RUNTIME_IDS)
+
+    def launch(self, executable, params='', windows=None, controls=None):
+        self.last_pid += 1
+        p = Process(self, self.last_pid, splitext(basename(executable))[0])
+        self.processes.append(p)
+        app = Application(self, p)
+        self.apps.append(app)
+        for _ in range(self.window_count if windows is None else windows):
+            self.open_window(app, controls=controls)
+        return app
+
+    def open_window(self, app, name=None, controls=None, owner=None):
+        """
+        :param owner: makes a modal window of the owner.
+        """
+        n = self.window_total
+        self.window_total += 1
+        w = Window(self, name or 'Window %d' % n, 'wnd_%d' % n, app=app, owner=owner)
+        self.populate(w, n, self.control_count if controls is None else controls)
+        app.windows.append(w)
+        if owner is None:
+            self.windows.append(w)
+        else:
+            owner.modals.append(w)
+        self.active = w
+        self.fire(WINDOW_OPENED)
+        return w
+
+    def populate(self, window, n, count):
+        """
+        Adds count controls to the window, nested in panels of at most fanout children.
+        """
+        controls = []
+        for j in range(count):
+            cls = CONTROL_KINDS[j % len(CONTROL_KINDS)]
+            controls.append(cls(self, '%s %d' % (cls.__name__, j), 'ctl_%d_%d' % (n, j)))
+        level = controls
+        while len(level) > self.fanout:
+            panels = []
+            for k in range(0, len(level), self.fanout):
+                p = Panel(self, '', '')
+                for c in level[k:k + self.fanout]:
+                    c.parent = p
+                    p.children.append(c)
+                panels.append(p)
+            level = panels
+        for c in level:
+            c.parent = window
+            window.children.append(c)
+
+    def add_control(self, parent, cls, name, automation_id=''):
+        c = cls(self, name, automation_id, parent)
+        parent.children.append(c)
+        self.fire(STRUCTURE_CHANGED)
+        return c
+
+    def remove(self, element):
+        element.removed = True
+        for e in element.descendants():
+            e.removed = True
+        if element.parent is not None:
+            element.parent.children.remove(element)
+            self.fire(STRUCTURE_CHANGED)
+
+    def close_window(self, w):
+        if w.removed:
+            return
+        for m in w.modals:
+            self.close_window(m)
+        self.remove(w)
+        if w in self.windows:
+            self.windows.remove(w)
+        if self.active is w:
+            self.active = None
+        self.fire(WINDOW_CLOSED)
+
+    def kill(self, app):
+        if app.Process.exited:
+            return
+        for w in list(app.windows):
+            self.close_window(w)
+        app.Process.exited = True
+        self.fire(PROCESS_EXITED)
+
+
+class SimBackend(Backend):
+    CRITERIA = tuple(CRITERIA_PROPERTIES)
+
+    def __init__(self, desktop=None):
+        self.desktop = desktop or SimDesktop()
+
+    def launch(self, executable, params):
+        self.desktop.call()
+        return self.desktop.launch(executable, params)
+
+    def attach(self, process):
+        self.desktop.call()
+        return process.app
+
+    def watch_exit(self, app, notify):
+        """
+        The exits are reported by the simulated desktop itself.
+        """
+        return True
+
+    def processes(self):
+        self.desktop.call()
+        return [p for p in self.desktop.processes if not p.exited]
+
+    def windows(self, app=None, parent=None):
+        if app:
+            return app.GetWindows()
+        if parent:
+            return parent.ModalWindows()
+        self.desktop.call()
+        return [w for w in self.desktop.windows if not w.removed]
+
+    def get_multiple(self, parent, c_type, criteria):
+        self.desktop.call()
+        if parent.removed:
+            raise ElementNotAvailable(repr(parent))
+        cls = CONTROL_TYPES.get(c_type)
+        checks = [(CRITERIA_PROPERTIES[name], v) for name, v in criteria]
+        res = []
+        for e in parent.descendants():
+            if cls is not None and not isinstance(e, cls):
+                continue
+            for p, v in checks:
+                if e.props.get(p) != v:
+                    break
+            else:
+                res.append(e)
+        return res
+
+    def alive(self, parent, elements):
+        self.desktop.call()
+        for e in [parent] + elements[:1] + elements[-1:]:
+            if e.removed:
+                return False
+        return True
+
+    def element_key(self, element):
+        return (element.runtime_id,)
+
+    def identity(self, obj):
+        if isinstance(obj, SimElement):
+            return self.element_key(obj)
+        if isinstance(obj, Application):
+            obj = obj.Process
+        if isinstance(obj, Process):
+            return ('pid', obj.Id, obj.StartTime)
+        return None
+
+    def texts(self, parent):
+        yield parent.Name
+        for t in labels_first((isinstance(e, Button), e.Name) for e in parent.descendants()
+                              if isinstance(e, (Label, Button))):
+            yield t
+
+    def fetch(self, root, elements, names):
+        """
+        As the White cache request: a single call going through the elements of the scope that are of the classes
+        of the candidates, or through all of them if a candidate is of a class with no control type of its own
+        (but then only for FETCH_ALL_MIN_ELEMENTS candidates at least).
+        """
+        classes = set([type(e) for e in elements])
+        if classes & UNTYPED:
+            if len(elements) < FETCH_ALL_MIN_ELEMENTS:
+                return [None for e in elements]
+            classes = None
+        if root is None:
+            scope = self.desktop.windows
+        else:
+            scope = list(root.descendants()) + getattr(root, 'modals', [])
+        found = set([id(e) for e in scope if not e.removed and (classes is None or type(e) in classes)])
+        self.desktop.call(len(found))
+        return [dict([(n, e.props.get(n)) for n in names]) if id(e) in found else None for e in elements]
+
+    def read(self, element, name):
+        return element.get(name)
+
+    def special_key(self, name):
+        return name
+
+    def event_source(self):
+        return self.desktop.events
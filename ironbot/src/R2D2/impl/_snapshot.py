@@ -0,0 +1,167 @@
+"""
+Text snapshots of windows and controls.
+
+A snapshot walks the element tree once, lazily: the texts are read one by one when they are asked for, so
+a search for a text stops at the first match, and the texts read so far are kept for the next search.
+The snapshots are cached per element, a cached snapshot is dropped when the UI events epoch changes or
+after a short TTL.
+
+>>> class Element(object):
+...     reads = 0
+...     def __init__(self, name, *children):
+...         self.name, self.children, self.next = name, list(children), None
+...         for a, b in zip(children, children[1:]):
+...             a.next = b
+...     def text(self):
+...         Element.reads += 1
+...         return self.name
+>>> def first_child(e):
+...     return e.children and e.children[0] or None
+>>> wnd = Element('Window', Element('Error', Element('Details')), Element('OK'))
+>>> walk = lambda e: walk_texts(e, first_child, lambda e: e.next, Element.text)
+>>> s = TextSnapshot(walk(wnd))
+>>> s.contains('Error'), Element.reads
+(True, 1)
+>>> s.texts(), Element.reads
+(['Error', 'Details', 'OK'], 3)
+>>> s.contains('Cancel'), Element.reads
+(False, 3)
+>>> list(labels_first(iter([(False, 'a'), (True, 'OK'), (False, 'b'), (True, 'Cancel')])))
+['a', 'b', 'OK', 'Cancel']
+>>> from _clock import VirtualClock
+>>> c, epoch = VirtualClock(), [0]
+>>> cache = SnapshotCache(walk, epoch=lambda: epoch[0], ttl=0.5, clock=c)
+>>> cache.get(wnd) is cache.get(wnd)
+True
+>>> s = cache.get(wnd); epoch[0] += 1
+>>> cache.get(wnd) is s
+False
+>>> s = cache.get(wnd); c.advance(1.0)
+>>> cache.get(wnd) is s
+False
+>>> def broken(e):
+...     yield 'Error'
+...     raise IOError('the window is gone')
+>>> cache = SnapshotCache(broken, clock=c)
+>>> s = cache.get(wnd); s.contains('Error')
+True
+>>> assert_raises(IOError, s.contains, 'OK')
+>>> assert_raises(IronbotException, s.texts)
+>>> cache.get(wnd) is s
+False
+"""
+from _clock import get_clock
+from _util import LRUCache, IronbotException, assert_raises
+
+SNAPSHOT_TTL = 0.5
+SNAPSHOT_CACHE_SIZE = 64
+
+
+def walk_texts(root, first_child, next_sibling, text):
+    """
+    Yields the texts of the descendants of the root in document order (depth first), reading the tree
+    only as far as the texts are consumed.
+    """
+    stack = [first_child(root)]
+    while stack:
+        e = stack.pop()
+        if e is None:
+            continue
+        yield text(e)
+        stack.append(next_sibling(e))
+        stack.append(first_child(e))
+
+
+def labels_first(texts):
+    """
+    :param texts: an iterator over (is_button, text) in the tree order.
+    :return: An iterator over the texts of the labels, then the texts of the buttons (the labels are yielded
+        as soon as they are read).
+    """
+    buttons = []
+    for is_button, text in texts:
+        if is_button:
+            buttons.append(text)
+        else:
+            yield text
+    for text in buttons:
+        yield text
+
+
+class TextSnapshot(object):
+    def __init__(self, texts, epoch=None, created=None):
+        """
+        :param texts: an iterator over the texts, consumed lazily.
+        """
+        self.source = texts
+        self.read = []
+        self.complete = False
+        self.failed = False
+        self.epoch = epoch
+        self.created = created
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self.read):
+                yield self.read[i]
+                i += 1
+            elif self.complete:
+                return
+            elif self.failed:
+                raise IronbotException('The texts could not be read completely')
+            else:
+                try:
+                    self.read.append(self.source.next())
+                except StopIteration:
+                    self.complete = True
+                except:
+                    #A partial snapshot must not pass for a complete one
+                    self.failed = True
+                    raise
+
+    def texts(self):
+        return list(self)
+
+    def contains(self, text):
+        for t in self:
+            if t == text:
+                return True
+        return False
+
+    def match(self, regexp):
+        for t in self:
+            if regexp.match(t):
+                return True
+        return False
+
+
+class SnapshotCache(object):
+    """
+    :param walk: walk(element) -> an iterator over the texts of the element.
+    :param key: key(element) -> a key identifying the element, None means the element is not cached.
+    :param epoch: epoch() -> a value that changes when the UI might have changed (None if unknown).
+    """
+    def __init__(self, walk, key=id, epoch=lambda: None, ttl=SNAPSHOT_TTL, size=SNAPSHOT_CACHE_SIZE, clock=None):
+        self.walk = walk
+        self.key = key
+        self.epoch = epoch
+        self.ttl = ttl
+        self.cache = LRUCache(size)
+        self.clock = clock
+
+    def get(self, element):
+        now = (self.clock or get_clock()).now()
+        epoch = self.epoch()
+        k = self.key(element)
+        if k is not None:
+            s = self.cache.get(k)
+            if s is not None and not s.failed and s.epoch == epoch and now - s.created < self.ttl:
+                return s
+        s = TextSnapshot(self.walk(element), epoch, now)
+        if k is not None:
+            self.cache.put(k, s)
+        return s
+
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,156 @@
+"""
+Telemetry of the error handler runs.
+
+Every handler run in a worker is reported as a record (see _errmon.worker): the handler test, its outcome,
+when it started and ended, and how long it took to find the error window. The parent adds the startup time
+of a cold worker (interpreter start and suite parsing). HandlerTelemetry aggregates the records into latency
+histograms per handler.
+
+>>> t = HandlerTelemetry()
+>>> t.add(HandlerRecord.from_dict({'test': 'Close Error', 'rc': 1, 'start': 10.0, 'end': 12.5, 'find_window': 0.4}, startup=3.0))
+>>> t.add(HandlerRecord.from_dict({'test': 'Close Error', 'rc': 0, 'start': 20.0, 'end': 20.5, 'find_window': 0.2}))
+>>> t.add(None, 'Close Error')
+>>> s = t.stats['Close Error']
+>>> s.runs, s.failed, s.died, s.duration.count, s.startup.count
+(3, 1, 1, 2, 1)
+>>> print t.report()
+Error handler 'Close Error': 3 run(s), 1 failed, 1 worker(s) died
+  duration:    n=2 mean=1.500s max=2.500s | <=0.5s: 1 | <=3s: 1
+  find window: n=2 mean=0.300s max=0.400s | <=0.3s: 1 | <=0.5s: 1
+  startup:     n=1 mean=3.000s max=3.000s | <=3s: 1
+"""
+import threading
+
+from _util import Immutable
+
+
+class HandlerRecord(Immutable):
+    __slots__ = ('test', 'rc', 'outcome', 'start', 'end', 'find_window', 'startup')
+
+    def __init__(self, test, rc, outcome, start, end, find_window=None, startup=None):
+        self._init(test=test, rc=rc, outcome=outcome, start=start, end=end, find_window=find_window,
+                   startup=startup)
+
+    @classmethod
+    def from_dict(cls, d, startup=None):
+        rc = int(d['rc'])
+        return cls(d['test'], rc, d.get('outcome') or ('PASS' if rc == 0 else 'FAIL'), d.get('start'), d.get('end'),
+                   d.get('find_window'), startup)
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+
+class Histogram(object):
+    """
+    A latency histogram with fixed (roughly logarithmic) bucket bounds, in seconds.
+
+    >>> h = Histogram()
+    >>> for v in (0.005, 0.02, 0.02, 7.0, 1000.0): h.add(v)
+    >>> h.count, h.max, h.buckets()
+    (5, 1000.0, [(0.01, 1), (0.03, 2), (10.0, 1), (None, 1)])
+    >>> h.add(None); h.count
+    5
+    """
+    BOUNDS = (0.01, 0.03, 0.1, 0.3, 0.5, 1.0, 3.0, 10.0, 30.0, 100.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def add(self, v):
+        if v is None:
+            return
+        i = 0
+        while i < len(self.BOUNDS) and v > self.BOUNDS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += v
+        if self.max is None or v > self.max:
+            self.max = v
+
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def buckets(self):
+        """
+        :return: [(upper bound or None for the overflow, count)] of the non-empty buckets.
+        """
+        bounds = self.BOUNDS + (None,)
+        return [(bounds[i], c) for i, c in enumerate(self.counts) if c]
+
+    def __str__(self):
+        if not self.count:
+            return 'n=0'
+        res = 'n=%d mean=%.3fs max=%.3fs' % (self.count, self.mean(), self.max)
+        for b, c in self.buckets():
+            if b is None:
+                res += ' | >%gs: %d' % (self.BOUNDS[-1], c)
+            else:
+                res += ' | <=%gs: %d' % (b, c)
+        return res
+
+
+class HandlerStats(object):
+    def __init__(self):
+        self.runs = 0
+        self.failed = 0
+        self.died = 0
+        self.duration = Histogram()
+        self.find_window = Histogram()
+        self.startup = Histogram()
+
+
+class HandlerTelemetry(object):
+    """
+    Per-handler statistics, fed by the monitor supervisor threads.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def add(self, record, test=None):
+        """
+        :param record: a HandlerRecord, or None if the worker died during the run of the 'test' handler.
+        """
+        if record is not None:
+            test = record.test
+        self.lock.acquire()
+        try:
+            s = self.stats.get(test)
+            if s is None:
+                s = self.stats[test] = HandlerStats()
+            s.runs += 1
+            if record is None:
+                s.died += 1
+                return
+            if record.rc:
+                s.failed += 1
+            s.duration.add(record.duration)
+            s.find_window.add(record.find_window)
+            s.startup.add(record.startup)
+        finally:
+            self.lock.release()
+
+    def report(self):
+        lines = []
+        self.lock.acquire()
+        try:
+            for test in sorted(self.stats):
+                s = self.stats[test]
+                lines.append("Error handler '%s': %d run(s), %d failed, %d worker(s) died"
+                             % (test, s.runs, s.failed, s.died))
+                lines.append('  duration:    %s' % s.duration)
+                lines.append('  find window: %s' % s.find_window)
+                lines.append('  startup:     %s' % s.startup)
+        finally:
+            self.lock.release()
+        return '\n'.join(lines)
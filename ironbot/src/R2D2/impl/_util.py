@@ -1,7 +1,16 @@
-from time import time, clock, sleep
+from os import environ
 from os.path import dirname, abspath, basename, join
+import json
+import logging
+import random
+import re
 import subprocess
 import sys
+import threading
+
+from _calibrate import host_multiplier
+from _events import EVENTS, CRASH_EVENTS, MONITOR_CRASHED
+from _clock import get_clock
 
 FASTER_COMPUTER = 1
 SLOW_COMPUTER = 3
@@ -79,103 +88,183 @@ def assert_raises(exc, f, *a, **kw):
         return
     raise AssertionError("A function has not raised the exception you are waiting for")
 
-def timing():
-    print("timing")
-    begin_time = time()
-    p = subprocess.call('ipy test.py', shell=True)
-    sum_time = time() - begin_time
-    return sum_time
 
-class Delay(object):
+class LRUCache(object):
+    """
+    A bounded mapping, the least recently used entries are evicted first
+    (a quarter of the cache at once, so that eviction is cheap on average).
+
+    >>> c = LRUCache(2)
+    >>> c.put('a', 1); c.put('b', 2)
+    >>> c.get('a'), c.get('q', 'none')
+    (1, 'none')
+    >>> c.put('c', 3)
+    >>> c.get('b') is None, sorted(c.data.keys())
+    (True, ['a', 'c'])
+    >>> c.hits, c.misses
+    (1, 2)
+    >>> c.clear(); len(c)
+    0
+    """
+    def __init__(self, size):
+        self.size = size
+        self.data = {}
+        self.tick = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        try:
+            entry = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.tick += 1
+        entry[1] = self.tick
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        if key not in self.data and len(self.data) >= self.size:
+            by_age = sorted(self.data.iteritems(), key=lambda kv: kv[1][1])
+            for k, _ in by_age[:max(1, self.size // 4)]:
+                del self.data[k]
+        self.tick += 1
+        self.data[key] = [value, self.tick]
+
+    def clear(self):
+        self.data.clear()
+
+
+RE_CACHE_SIZE = 512
+RE_CACHE = LRUCache(RE_CACHE_SIZE)
+_RE_TYPE = type(re.compile(''))
+
+
+def compile_re(pattern):
+    """
+    Compiles a regular expression through the process-wide RE_CACHE, compiled patterns are returned as is.
+
+    >>> r = compile_re('^a+$')
+    >>> compile_re('^a+$') is r, compile_re(r) is r, bool(r.match('aa'))
+    (True, True, True)
+    """
+    if type(pattern) is _RE_TYPE:
+        return pattern
+    r = RE_CACHE.get(pattern)
+    if r is None:
+        r = re.compile(pattern)
+        RE_CACHE.put(pattern, r)
+    return r
+
+
+class Immutable(object):
+    """
+    A base for slotted value types: fields are set once with _init(), compared and hashed all together.
+
+    >>> class P(Immutable):
+    ...     __slots__ = ('x', 'y')
+    ...     def __init__(self, x, y): self._init(x=x, y=y)
+    >>> P(1, 2) == P(1, 2), P(1, 2) != P(2, 1), hash(P(1, 2)) == hash(P(1, 2))
+    (True, True, True)
+    >>> assert_raises(AttributeError, setattr, P(1, 2), 'x', 0)
+    """
+    __slots__ = ()
+
+    def _init(self, **kw):
+        for k, v in kw.iteritems():
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'%s' objects are immutable" % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("'%s' objects are immutable" % type(self).__name__)
+
+    def _fields(self):
+        return tuple([getattr(self, n) for n in self.__slots__])
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._fields() == other._fields()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self._fields()))
+
+
+class Delay(Immutable):
     COEFF = (('ms', 0.001), ('s', 1.0), ('m', 60.0), ('h', 3600.0)) #The order is significant!!!
     FOREVER = 'forever'
     BENCHMARKED_FLAG = '~'
     BENCHMARK_INITIAL = False
-    BENCHMARK = VERY_SLOW_COMPUTER     #Lower is better (faster computer)
+    BENCHMARK = None     #Lower is better (faster computer), None until the host is calibrated
     @classmethod
-    def do_benchmarking(cls, time_f=time):
+    def do_benchmarking(cls, calibrate=host_multiplier):
         """
-        >>> Delay.BENCHMARK=None
-        >>> Delay.do_benchmarking(get_function((0, FASTER_COMPUTER*0.5)))
-        >>> Delay.BENCHMARK
-        1
-        >>> Delay.BENCHMARK=None
-        >>> Delay.do_benchmarking(get_function((FASTER_COMPUTER,SLOW_COMPUTER)))
-        >>> Delay.BENCHMARK
-        3
-        >>> Delay.BENCHMARK=None
-        >>> Delay.do_benchmarking(get_function((0,FASTER_COMPUTER*5)))
+        Sets BENCHMARK from the host calibration (see _calibrate) unless it is set already. Called when
+        a suite starts, or when the first benchmarked delay is used.
+
+        >>> b, Delay.BENCHMARK = Delay.BENCHMARK, None
+        >>> Delay.do_benchmarking(lambda: 2.5)
         >>> Delay.BENCHMARK
-        5
+        2.5
         >>> Delay.BENCHMARK=7
-        >>> Delay.do_benchmarking(get_function((0,FASTER_COMPUTER*5)))
+        >>> Delay.do_benchmarking(lambda: 2.5)
         >>> Delay.BENCHMARK
         7
-        >>> Delay.BENCHMARK=None
-        >>> Delay.do_benchmarking(get_function((0,FASTER_COMPUTER*1.5)))
-        >>> Delay.BENCHMARK
-        3
-        >>> Delay.BENCHMARK=None
-        >>> Delay.do_benchmarking(get_function((0,0)))
-        >>> Delay.BENCHMARK
-        1
-    """
+        >>> Delay.BENCHMARK = b
+        """
         if cls.BENCHMARK is None:
             cls.BENCHMARK_INITIAL = True
-            cls.BENCHMARK = FASTER_COMPUTER
-            begin_time = time_f()
-            p = subprocess.call('ipy test.py', shell=True)
-            s_time = time_f() - begin_time
-            if s_time > SLOW_COMPUTER and s_time < VERY_SLOW_COMPUTER:
-               cls.BENCHMARK = SLOW_COMPUTER
-            if s_time > VERY_SLOW_COMPUTER:
-              cls.BENCHMARK = VERY_SLOW_COMPUTER
-
-    def __cmp__(self, sec):
-        """
-        >>> Delay('forever') == Delay('forever'), Delay('forever') > Delay('10s'), Delay('10s') < Delay('forever')
-        (True, True, True)
-        >>> Delay('10s') == Delay('10s'), Delay('11s') > Delay('10s'), Delay('10s') < Delay('11s')
-        (True, True, True)
-        >>> Delay('forever') == None, Delay('forever') > 10, 10 < Delay('forever')
-        (True, True, True)
-        >>> Delay('10s') == 10, Delay('11s') > 10, Delay('10s') < 11
-        (True, True, True)
-        >>> 11 > Delay('10s'), 9 < Delay('10s'), 10 == Delay('10s')
-        (True, True, True)
-        """
-        if isinstance(sec, Delay):
-            sec = sec.value
-        if sec is None:
-            if self.value is None:
-                return 0
-            return -1
-        if self.value is None or self.value > sec:
-            return 1
-        if self.value < sec:
-            return -1
-        return 0
+            cls.BENCHMARK = calibrate()
 
+    __slots__ = ('seconds', 'benchmarked')
+    INTERNED = {}
+    INTERNED_MAX = 1024
 
-    def __init__(self, s):
+    def __new__(cls, s):
         """
+        Delay values are interned: parsing the same string twice returns the same object.
+
         >>> from math import fabs
         >>> assert fabs(Delay(' 10s ').value - 10) < 0.00001
         >>> assert fabs(Delay('10ms').value - 0.01) < 0.00001
         >>> assert_raises(IronbotException, Delay, '10ns')
         >>> assert_raises(IronbotException, Delay, 'a10s')
+        >>> b, Delay.BENCHMARK = Delay.BENCHMARK, 2
         >>> assert fabs(Delay(' ~10s ').value - 20) < 0.00001
         >>> assert fabs(Delay('~10ms').value - 0.02) < 0.00001
+        >>> Delay.BENCHMARK = b
         >>> assert_raises(IronbotException, Delay, '~10ns')
         >>> assert_raises(IronbotException, Delay, '~a10s')
         >>> assert Delay('forever').value is None
+        >>> Delay('~5s') is Delay('~5s')
+        True
+        """
+        try:
+            return cls.INTERNED[s]
+        except KeyError:
+            pass
+        d = cls.from_seconds(*cls.parse(s))
+        if len(cls.INTERNED) < cls.INTERNED_MAX:
+            cls.INTERNED[s] = d
+        return d
+
+    @classmethod
+    def parse(cls, s):
+        """
+        :return: (seconds, benchmarked) for a delay string, seconds is None for 'forever'.
         """
         s = s.strip()
-        if s.lower() == self.FOREVER:
-            self.value = None
-            return
+        if s.lower() == cls.FOREVER:
+            return None, False
         k = None
-        for u, v in self.COEFF:
+        for u, v in cls.COEFF:
             if s.endswith(u):
                 k = v
                 s = s[:-len(u)]
@@ -183,19 +272,206 @@ class Delay(object):
         if not k:
             raise IronbotException("Cannot parse a delay value, no time units given: '%s'" % s)
 
-        if s.startswith(self.BENCHMARKED_FLAG):
-            s = s[len(self.BENCHMARKED_FLAG):]
-            k *= self.BENCHMARK
+        benchmarked = s.startswith(cls.BENCHMARKED_FLAG)
+        if benchmarked:
+            s = s[len(cls.BENCHMARKED_FLAG):]
 
         try:
-            self.value = float(s) * k
+            return float(s) * k, benchmarked
         except ValueError:
             raise IronbotException("Cannot parse a delay value, it should contain a float value: '%s'" % s)
 
+    @classmethod
+    def from_seconds(cls, seconds, benchmarked=False):
+        """
+        >>> Delay.from_seconds(1.5).value, Delay.from_seconds(None).value
+        (1.5, None)
+        """
+        d = object.__new__(cls)
+        d._init(seconds=seconds, benchmarked=benchmarked)
+        return d
+
+    def __init__(self, s):
+        pass
+
+    def __repr__(self):
+        if self.seconds is None:
+            return 'Delay(%r)' % self.FOREVER
+        return 'Delay(%r)' % ('%s%gs' % (self.BENCHMARKED_FLAG if self.benchmarked else '', self.seconds))
+
+    @property
+    def value(self):
+        """
+        The delay in seconds (benchmarked delays are scaled by the current BENCHMARK), None means forever.
+        """
+        if self.benchmarked and self.seconds is not None:
+            if Delay.BENCHMARK is None:
+                Delay.do_benchmarking()
+            return self.seconds * Delay.BENCHMARK
+        return self.seconds
+
+    @property
+    def forever(self):
+        return self.seconds is None
+
+    def deadline(self, start):
+        """
+        >>> Delay('10s').deadline(5.0), Delay('forever').deadline(5.0)
+        (15.0, None)
+        """
+        if self.seconds is None:
+            return None
+        return start + self.value
+
+    def remaining(self, elapsed):
+        """
+        >>> Delay('10s').remaining(4.0), Delay('10s').remaining(12.0), Delay('forever').remaining(4.0)
+        (6.0, 0.0, None)
+        """
+        if self.seconds is None:
+            return None
+        return max(0.0, self.value - elapsed)
+
+    def expired(self, elapsed):
+        """
+        >>> Delay('10s').expired(9.0), Delay('10s').expired(10.0), Delay('10s').expired(10.1), Delay('forever').expired(1e9)
+        (False, False, True, False)
+        """
+        if self.seconds is None:
+            return False
+        return elapsed - TIME_ACCURACY > self.value
+
+    def __add__(self, other):
+        """
+        Adding a delay to a point of time gives a deadline (None for 'forever'),
+        adding two delays gives a delay.
+
+        >>> 5 + Delay('10s'), Delay('forever') + 5, Delay('1s') + Delay('500ms')
+        (15.0, None, Delay('1.5s'))
+        """
+        if isinstance(other, Delay):
+            if self.seconds is None or other.seconds is None:
+                return Delay(self.FOREVER)
+            return Delay.from_seconds(self.value + other.value)
+        return self.deadline(other)
+
+    __radd__ = __add__
+
+    def __mul__(self, k):
+        """
+        >>> Delay('10s') * 1.5, Delay('forever') * 2
+        (Delay('15s'), Delay('forever'))
+        """
+        if self.seconds is None:
+            return self
+        return Delay.from_seconds(self.value * k)
+
+    __rmul__ = __mul__
+
+    def _sort_value(self):
+        if self.seconds is None:
+            return _INFINITY
+        return self.value
+
+    def compare(self, other):
+        """
+        Compares the current values (benchmarked delays are scaled by the current BENCHMARK), with numbers
+        (seconds) as well; None stands for 'forever'. The == operator compares the delays as written,
+        so it does not depend on the host.
+
+        >>> Delay('forever').compare(Delay('forever')), Delay('forever').compare(Delay('10s')), Delay('10s').compare(None)
+        (0, 1, -1)
+        >>> Delay('10s').compare(10), Delay('11s').compare(10), Delay('10s').compare(11)
+        (0, 1, -1)
+        >>> b, Delay.BENCHMARK = Delay.BENCHMARK, 2
+        >>> Delay('~2s').compare(Delay('4s')), Delay('~2s') == Delay('4s'), Delay('~2s') == Delay.from_seconds(2, True)
+        (0, False, True)
+        >>> h = hash(Delay('~2s')); Delay.BENCHMARK = b; h == hash(Delay('~2s'))
+        True
+
+        :return: -1, 0 or 1.
+        """
+        return cmp(self._sort_value(), _delay_sort_value(other))
+
+
+_INFINITY = float('inf')
+
+
+def _delay_sort_value(v):
+    if isinstance(v, Delay):
+        return v._sort_value()
+    if v is None:
+        return _INFINITY
+    return v
+
 
 TIME_ACCURACY = 0.0001
 WAIT_GRANULARITY = 0.2
 
+
+class Deadline(object):
+    """
+    A Delay counted from a point of time of a clock (the current clock by default, see _clock):
+    the checks are those of the Delay for the time elapsed since the start.
+
+    >>> from _clock import VirtualClock
+    >>> c = VirtualClock()
+    >>> d = Deadline(Delay('10s'), c)
+    >>> c.advance(4); d.elapsed(), d.remaining(), d.expired(), d.end
+    (4.0, 6.0, False, 10.0)
+    >>> c.advance(6.1); d.remaining(), d.expired()
+    (0.0, True)
+    >>> d.restart(); d.expired()
+    False
+    >>> d = Deadline(Delay('forever'), c)
+    >>> c.advance(1e9); d.forever, d.zero, d.remaining(), d.expired(), d.end
+    (True, False, None, False, None)
+    >>> Deadline(Delay('0s'), c).zero, Deadline(0.0, c).zero
+    (True, True)
+    """
+    __slots__ = ('clock', 'timeout', 'start', 'end')
+
+    def __init__(self, timeout, clock=None):
+        """
+        :param timeout: a Delay, or seconds, None means forever.
+        """
+        self.clock = clock or get_clock()
+        if not isinstance(timeout, Delay):
+            timeout = Delay.from_seconds(timeout)
+        self.timeout = timeout
+        self.restart()
+
+    def __repr__(self):
+        return 'Deadline(%r, remaining=%r)' % (self.timeout, self.remaining())
+
+    def restart(self):
+        self.start = self.clock.now()
+        #The point of time the timeout expires at, None for 'forever'
+        self.end = self.start + self.timeout
+
+    @property
+    def forever(self):
+        return self.timeout.forever
+
+    @property
+    def zero(self):
+        """
+        True for a zero timeout: a single check, no waiting.
+        """
+        return not self.timeout.forever and self.timeout.value <= 0
+
+    def elapsed(self):
+        return self.clock.now() - self.start
+
+    def remaining(self):
+        return self.timeout.remaining(self.elapsed())
+
+    def expired(self):
+        return self.timeout.expired(self.elapsed())
+
+#The longest wait for a crash event when the finalization has no timeout to wait for
+EVENT_SAFETY_INTERVAL = 1.0
+
 MONITORING = None
 
 
@@ -204,19 +480,198 @@ def set_monitoring(monitoring):
     MONITORING = monitoring
 
 
-def waiting_iterator(timeout):
-    t0 = clock()
+class FixedPolling(Immutable):
+    """
+    Polls with the same interval every time.
+
+    >>> it = FixedPolling(Delay('200ms')).intervals()
+    >>> it.next(), it.next()
+    (0.2, 0.2)
+    """
+    __slots__ = ('interval',)
+
+    def __init__(self, interval):
+        self._init(interval=interval)
+
+    def __repr__(self):
+        return 'FixedPolling(%r)' % self.interval
+
+    def intervals(self, rnd=random.random):
+        while True:
+            yield self.interval.value
+
+
+class BackoffPolling(Immutable):
+    """
+    Polls often at first, then less and less often: the interval starts at 'min', grows 'factor' times
+    per poll up to 'cap', and each interval is shortened by a random part of up to 'jitter'.
+
+    >>> it = BackoffPolling(Delay('10ms'), Delay('50ms'), 2.0, 0.5).intervals(rnd=lambda: 0.0)
+    >>> [round(it.next(), 3) for _ in range(5)]
+    [0.01, 0.02, 0.04, 0.05, 0.05]
+    >>> it = BackoffPolling(Delay('10ms'), Delay('50ms'), 2.0, 0.5).intervals(rnd=lambda: 1.0)
+    >>> [round(it.next(), 3) for _ in range(4)]
+    [0.005, 0.01, 0.02, 0.025]
+    """
+    __slots__ = ('min', 'cap', 'factor', 'jitter')
+    FACTOR = 2.0
+    JITTER = 0.1
+
+    def __init__(self, min, cap, factor=FACTOR, jitter=JITTER):
+        if factor < 1.0 or not 0.0 <= jitter < 1.0:
+            raise IronbotException("Polling backoff factor should be >= 1 and jitter in [0, 1)")
+        self._init(min=min, cap=cap, factor=factor, jitter=jitter)
+
+    def __repr__(self):
+        return 'BackoffPolling(%r, %r, %g, %g)' % (self.min, self.cap, self.factor, self.jitter)
+
+    def intervals(self, rnd=random.random):
+        v, cap = self.min.value, self.cap.value
+        while True:
+            v = min(v, cap)
+            yield v * (1.0 - self.jitter * rnd())
+            v *= self.factor
+
+
+POLLING_FIXED = 'fixed'
+POLLING_BACKOFF = 'backoff'
+
+
+def parse_polling(s):
+    """
+    Polling policy specifications: 'fixed', 'fixed:<delay>', 'backoff', 'backoff:<min>:<cap>[:<factor>]'.
+
+    >>> parse_polling('fixed')
+    FixedPolling(Delay('0.2s'))
+    >>> parse_polling(' Fixed:~50ms ')
+    FixedPolling(Delay('~0.05s'))
+    >>> parse_polling('backoff')
+    BackoffPolling(Delay('0.01s'), Delay('0.2s'), 2, 0.1)
+    >>> parse_polling('backoff:20ms:1s:1.5')
+    BackoffPolling(Delay('0.02s'), Delay('1s'), 1.5, 0.1)
+    >>> assert_raises(IronbotException, parse_polling, 'often')
+    >>> assert_raises(IronbotException, parse_polling, 'backoff:20ms')
+    >>> assert_raises(IronbotException, parse_polling, 'fixed:forever')
+    """
+    parts = [v.strip() for v in s.strip().split(':')]
+    kind, args = parts[0].lower(), parts[1:]
+    if kind == POLLING_FIXED and len(args) <= 1:
+        if not args:
+            return FixedPolling(Delay.from_seconds(WAIT_GRANULARITY))
+        res = FixedPolling(Delay(args[0]))
+    elif kind == POLLING_BACKOFF and len(args) in (0, 2, 3):
+        if not args:
+            return BackoffPolling(Delay('10ms'), Delay.from_seconds(WAIT_GRANULARITY))
+        factor = BackoffPolling.FACTOR
+        if len(args) == 3:
+            try:
+                factor = float(args[2])
+            except ValueError:
+                raise IronbotException("Cannot parse a polling backoff factor: '%s'" % args[2])
+        res = BackoffPolling(Delay(args[0]), Delay(args[1]), factor)
+    else:
+        raise IronbotException("Cannot parse a polling policy: '%s' (expected '%s[:<delay>]' or '%s[:<min>:<cap>[:<factor>]]')"
+                               % (s, POLLING_FIXED, POLLING_BACKOFF))
+    for d in res._fields():
+        if isinstance(d, Delay) and d.forever:
+            raise IronbotException("A polling interval cannot be '%s': '%s'" % (Delay.FOREVER, s))
+    return res
+
+
+#The policy used by the waiting keywords unless they are given a 'poll' parameter (see the Set Polling keyword).
+#IRONBOT_POLLING in the environment may select another one for all of the suites.
+POLLING = parse_polling(environ.get('IRONBOT_POLLING', POLLING_FIXED))
+
+
+def get_default_polling():
+    return POLLING
+
+
+def set_default_polling(polling):
+    """
+    :param polling: a polling policy object or its specification string (see parse_polling).
+    :return: The previous policy.
+    """
+    global POLLING
+    if isinstance(polling, basestring):
+        polling = parse_polling(polling)
+    old, POLLING = POLLING, polling
+    return old
+
+
+def waiting_iterator(timeout, polling=None, events=None):
+    """
+    Yields once, then keeps yielding until the timeout expires, sleeping between the iterations
+    as the polling policy says. A sleep never goes past the timeout.
+
+    If the waiting keyword gives the kinds of UI events (see _events) that may change its result, and there is
+    a live event source, one of those events ends the sleep early. The sleep is still never longer than
+    the polling interval, as not every change is reported by an event (e.g. the focus). A crash detected
+    by the error monitors ends any sleep at once.
+
+    >>> len(list(waiting_iterator(None)))
+    1
+    >>> from _clock import VirtualClock, set_clock
+    >>> old = set_clock(VirtualClock())
+    >>> n = len(list(waiting_iterator(Delay('1m'), parse_polling('fixed:1s'))))
+    >>> n, get_clock().now()
+    (62, 60.0)
+    >>> len(list(waiting_iterator(Delay('0s')))), get_clock().now()
+    (1, 60.0)
+    >>> old_sleeps = get_clock().sleeps
+    >>> n = len(list(waiting_iterator(Delay('1m'), parse_polling('backoff:10ms:10s'))))
+    >>> get_clock().now(), get_clock().sleeps - old_sleeps < 20
+    (120.0, True)
+    >>> from _events import FakeEventSource, UI_EVENTS
+    >>> EVENTS.subscribe(FakeEventSource())
+    >>> n = len(list(waiting_iterator(Delay('1m'), parse_polling('fixed:500ms'), UI_EVENTS)))
+    >>> n, get_clock().now()
+    (122, 180.0)
+    >>> EVENTS.unsubscribe_all()
+    >>> c = set_clock(old)
+
+    An event wakes the wait up at once (the virtual clock never blocks, so this one runs in real time):
+
+    >>> from _clock import MonotonicClock, monotonic
+    >>> from _events import WINDOW_OPENED
+    >>> old = set_clock(MonotonicClock()); src = FakeEventSource(); EVENTS.subscribe(src)
+    >>> t0, n = monotonic(), 0
+    >>> for _ in waiting_iterator(Delay('30s'), parse_polling('fixed:10s'), UI_EVENTS):
+    ...     n += 1
+    ...     if n == 1:
+    ...         t = src.fire_later(0.05, WINDOW_OPENED)
+    ...     else:
+    ...         break
+    >>> n, monotonic() - t0 < 5.0
+    (2, True)
+    >>> t.join(); EVENTS.unsubscribe_all(); c = set_clock(old)
+    """
+    intervals = (polling or POLLING).intervals()
+    wait_events = events and EVENTS.active
+    if not wait_events:
+        events = CRASH_EVENTS
+    clock = get_clock()
+    deadline = Deadline(timeout or 0.0, clock)
+    #A zero timeout is a single check, even if the clock does not move
+    sleeping = not deadline.zero
     first_loop = True
-    while first_loop or (timeout and timeout >= clock() - t0 - TIME_ACCURACY):
+    while first_loop or (sleeping and not deadline.expired()):
         first_loop = False
-        if MONITORING:
+        if MONITORING is not None and MONITORING.crashed:
             MONITORING.check_monitors()
+        stamp = EVENTS.stamp(events)
         yield
-        if timeout and timeout.value:
-            sleep(WAIT_GRANULARITY)
-    if timeout and timeout.value:
+        if sleeping:
+            interval = intervals.next()
+            remaining = deadline.remaining()
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                interval = min(interval, remaining)
+            EVENTS.wait(stamp, interval, events, clock)
+    if sleeping:
         yield
-    if MONITORING:
+    if MONITORING is not None and MONITORING.crashed:
         MONITORING.check_monitors()
 
 def _negate(not_found, v):
@@ -376,86 +831,366 @@ def result_modifier(res, src_list=None, not_found=False, any=False, all=False, s
     return make_prefer_bool(True, res, None)
 
 
+ERRMON_SCRIPT = join(dirname(abspath(__file__)), '_errmon.py')
+
+
+class HandlerWorker(object):
+    """
+    A warm _errmon.py worker: it loads the handler suite once and runs its tests on request.
+    The requests and the results are JSON lines over the worker's stdin and stdout.
+    """
+    def __init__(self, command):
+        self.clock = get_clock()
+        self.spawned_at = self.clock.now()
+        self.cold = True
+        self.popen = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def alive(self):
+        return self.popen.poll() is None
+
+    def run(self, test, result_file):
+        """
+        :return: The HandlerRecord of the handler test run (see _telemetry), or None if the worker died.
+            The first run of a worker also tells the worker startup time.
+        """
+        from _telemetry import HandlerRecord
+        try:
+            self.popen.stdin.write(json.dumps({'test': test, 'result_file': result_file}) + '\n')
+            self.popen.stdin.flush()
+            line = self.popen.stdout.readline()
+            if not line:
+                return None
+            record = json.loads(line)
+            record.setdefault('test', test)
+            startup = None
+            if self.cold:
+                self.cold = False
+                duration = 0.0
+                if record.get('start') is not None and record.get('end') is not None:
+                    duration = record['end'] - record['start']
+                startup = max(0.0, self.clock.now() - self.spawned_at - duration)
+            return HandlerRecord.from_dict(record, startup)
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def kill(self):
+        if self.alive():
+            try:
+                self.popen.kill()
+            except OSError:
+                pass
+        self.popen.wait()
+
+
+class WorkerPool(object):
+    """
+    The idle warm workers of a handler suite. A worker is taken for a handler run and put back after it,
+    so the interpreter start and the suite parsing are paid once per worker, not once per handler run.
+    """
+    def __init__(self, exec_file):
+        self.exec_file = exec_file
+        self.idle = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.spawned = 0
+
+    def command(self):
+        return [sys.executable, ERRMON_SCRIPT, '--worker', self.exec_file]
+
+    def acquire(self):
+        self.lock.acquire()
+        try:
+            if self.closed:
+                raise IronbotException('The handler worker pool is closed')
+            while self.idle:
+                w = self.idle.pop()
+                if w.alive():
+                    return w
+            self.spawned += 1
+        finally:
+            self.lock.release()
+        return HandlerWorker(self.command())
+
+    def release(self, worker):
+        self.lock.acquire()
+        try:
+            if not self.closed and worker.alive():
+                self.idle.append(worker)
+                return
+        finally:
+            self.lock.release()
+        worker.kill()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        finally:
+            self.lock.release()
+        for w in idle:
+            w.kill()
+
+
 class ErrorMonitor(object):
     """
-    >>> em = ErrorMonitor('../../../tests/robot/errmon_01.robot', 'Errwnd_test', 'NONE')
+    Keeps an error handler (a robot test of the handler suite) running in a pool worker. A supervisor thread
+    waits for each handler run to end, counts the failed runs as errors, reports the end to
+    on_exit(monitor, returncode, record) and runs the handler again.
+
+    >>> FAKE_WORKER = ('import sys, json; [sys.stdout.write(json.dumps(dict(rc=1)) + chr(10)) or sys.stdout.flush() '
+    ...                'for l in iter(sys.stdin.readline, str())]')
+    >>> class FakePool(WorkerPool):
+    ...     def command(self):
+    ...         return [sys.executable, '-c', FAKE_WORKER]
+    >>> pool = FakePool('errmon_01.robot')
+    >>> runs = threading.Event()
+    >>> em = ErrorMonitor('errmon_01.robot', 'Errwnd_test', 'NONE', on_exit=lambda m, rc, r: m.errors > 2 and runs.set(), pool=pool)
+    >>> _ = runs.wait(30.0); em.kill(); pool.close()
+    >>> em.errors > 2, pool.spawned, em.thread
+    (True, 1, None)
+
+    A closed pool stops the monitor, a worker that cannot be started is an error and stops it as well:
+
+    >>> em = ErrorMonitor('errmon_01.robot', 'Errwnd_test', 'NONE', pool=pool); em.thread.join()
+    >>> em.stopped, em.errors
+    (True, 0)
+    >>> class BrokenPool(WorkerPool):
+    ...     def command(self):
+    ...         return ['/nonexistent/python']
+    >>> exits = []
+    >>> em = ErrorMonitor('errmon_01.robot', 'Errwnd_test', 'NONE', on_exit=lambda m, rc, r: exits.append(rc),
+    ...                   pool=BrokenPool('errmon_01.robot')); em.thread.join()
+    >>> em.stopped, em.errors, exits
+    (True, 1, [-1])
     """
-    errors = 0
+    #A worker that dies is replaced after this pause, so that a broken handler suite does not spin
+    RESPAWN_DELAY = 1.0
 
-    def __init__(self, exec_file, test, result_file):
+    def __init__(self, exec_file, test, result_file, on_exit=None, pool=None):
         self.exec_file = exec_file
         self.result_file = result_file
         self.test = test
-        self.popen = None
+        self.on_exit = on_exit
+        self.pool = pool or WorkerPool(exec_file)
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.worker = None
+        self.thread = None
         self.start()
 
     def start(self):
-        if self.popen:
-            if self.popen.poll() is None:
-                return False
-            self.popen = None
-
-        #import logging
-        #logging.critical('' % ())
-        self.popen = subprocess.Popen([sys.executable, join(dirname(abspath(__file__)), '_errmon.py'),
-                                       self.exec_file, self.test, self.result_file])
+        if self.thread:
+            return False
+        self.thread = threading.Thread(target=self._supervise, name='ErrorMonitor(%s)' % self.test)
+        self.thread.daemon = True
+        self.thread.start()
         return True
 
-    def check_state(self):
-        #import logging
-        #logging.error(repr(self.popen.poll()))
-        if self.popen.poll() is not None:
-            if self.popen.returncode:
-                self.errors += 1
-            self.start()
+    def _supervise(self):
+        while True:
+            self.lock.acquire()
+            try:
+                if self.stopped:
+                    return
+                try:
+                    worker = self.worker = self.pool.acquire()
+                except IronbotException:
+                    #The pool is closed: the monitoring is over
+                    self.stopped = True
+                    return
+                except OSError, e:
+                    logging.warning("Cannot start an error handler worker for '%s': %s" % (self.test, e))
+                    self.stopped = True
+                    self.errors += 1
+                    worker = None
+            finally:
+                self.lock.release()
+            if worker is None:
+                if self.on_exit:
+                    self.on_exit(self, -1, None)
+                return
+
+            record = worker.run(self.test, self.result_file)
+
+            self.lock.acquire()
+            try:
+                self.worker = None
+                if self.stopped:
+                    worker.kill()
+                    return
+                if record is None:
+                    logging.warning("An error handler worker died when running '%s'" % self.test)
+                    returncode = -1
+                else:
+                    returncode = record.rc
+                if returncode:
+                    self.errors += 1
+            finally:
+                self.lock.release()
+            self.pool.release(worker)
+            if self.on_exit:
+                self.on_exit(self, returncode, record)
+            if not worker.alive():
+                get_clock().sleep(self.RESPAWN_DELAY)
 
     def kill(self):
-        if self.popen and self.popen.poll():
-            self.popen.kill()
-            self.popen = None
+        self.lock.acquire()
+        try:
+            self.stopped = True
+            worker, thread = self.worker, self.thread
+            self.worker, self.thread = None, None
+        finally:
+            self.lock.release()
+        if worker:
+            worker.kill()
+        if thread and thread is not threading.currentThread():
+            thread.join()
 
 
+class FinalizationProgress(Immutable):
+    __slots__ = ('state', 'errors', 'quiet_remaining', 'total_remaining')
 
-class Monitoring(object):
-    errors = 0
+    def __init__(self, state, errors, quiet_remaining, total_remaining):
+        self._init(state=state, errors=errors, quiet_remaining=quiet_remaining, total_remaining=total_remaining)
+
+    def __repr__(self):
+        return 'FinalizationProgress(%r, errors=%r, quiet_remaining=%r, total_remaining=%r)' % self._fields()
 
+
+class Finalization(object):
+    """
+    Waits for a crash storm to calm down: the state is 'waiting' until no new errors come for the quiescence
+    timeout ('quiet'), or until the total timeout passes ('timed_out'). Between the checks it sleeps until
+    the next handler exit or the nearest deadline.
+
+    >>> from _clock import VirtualClock
+    >>> class FakeMonitoring(object):
+    ...     errors = 1
+    >>> m, c = FakeMonitoring(), VirtualClock()
+    >>> f = Finalization(m, Delay('30s'), Delay('1h'), c)
+    >>> f.progress()
+    FinalizationProgress('waiting', errors=0, quiet_remaining=30.0, total_remaining=3600.0)
+    >>> c.advance(20); m.errors = 3; f.step()
+    FinalizationProgress('waiting', errors=2, quiet_remaining=0.0, total_remaining=3550.0)
+    >>> c.sleeps
+    1
+    >>> seen = []
+    >>> f.run(seen.append)
+    FinalizationProgress('quiet', errors=2, quiet_remaining=0.0, total_remaining=3550.0)
+    >>> seen, c.sleeps
+    ([FinalizationProgress('quiet', errors=2, quiet_remaining=0.0, total_remaining=3550.0)], 1)
+    >>> f = Finalization(m, Delay('30s'), Delay('10s'), c)
+    >>> f.run().state, c.now()
+    ('timed_out', 60.0)
+    """
+    WAITING = 'waiting'
+    QUIET = 'quiet'
+    TIMED_OUT = 'timed_out'
+
+    def __init__(self, monitoring, quiet_timeout, total_timeout, clock=None):
+        self.monitoring = monitoring
+        self.clock = clock or get_clock()
+        self.quiet = Deadline(quiet_timeout or 0.0, self.clock)
+        self.total = Deadline(total_timeout or 0.0, self.clock)
+        self.initial_errors = self.last_errors = monitoring.errors
+        self.state = self.WAITING
+
+    def progress(self):
+        return FinalizationProgress(self.state, self.last_errors - self.initial_errors, self.quiet.remaining(),
+                                    self.total.remaining())
+
+    def step(self):
+        """
+        Checks for new errors and moves to the next state, or sleeps if it is still waiting.
+        """
+        if self.state != self.WAITING:
+            return self.progress()
+        stamp = EVENTS.stamp(CRASH_EVENTS)
+        errors = self.monitoring.errors
+        if errors != self.last_errors:
+            self.last_errors = errors
+            self.quiet.restart()
+        remaining = [r for r in (self.quiet.remaining(), self.total.remaining()) if r is not None]
+        if self.quiet.remaining() == 0:
+            self.state = self.QUIET
+        elif self.total.remaining() == 0:
+            self.state = self.TIMED_OUT
+        else:
+            EVENTS.wait(stamp, min(remaining or [EVENT_SAFETY_INTERVAL]), CRASH_EVENTS, self.clock)
+        return self.progress()
+
+    def run(self, on_progress=None):
+        """
+        :param on_progress: called with the progress after every wake-up.
+        :return: The final progress.
+        """
+        while self.state == self.WAITING:
+            progress = self.step()
+            if on_progress:
+                on_progress(progress)
+        return self.progress()
+
+
+class Monitoring(object):
+    """
+    The error monitors of a suite. The crash flag is set by the monitor supervisor threads, the waits
+    only read it.
+    """
     def __init__(self, ft=Delay('30s'), ftt=Delay('1h')):
         self.monitors = []
         self.FINALIZATION_TOTAL_TIMEOUT = ftt
         self.FINALIZATION_TIMEOUT = ft
+        self.lock = threading.Lock()
+        self.errors = 0
+        self.crashed = False
+        self.pools = {}
+        from _telemetry import HandlerTelemetry
+        self.telemetry = HandlerTelemetry()
 
     def add_monitor(self, exec_file, test):
-        self.monitors.append(ErrorMonitor(exec_file, test, 'NONE'))
+        pool = self.pools.get(exec_file)
+        if pool is None:
+            pool = self.pools[exec_file] = WorkerPool(exec_file)
+        self.monitors.append(ErrorMonitor(exec_file, test, 'NONE', on_exit=self.handler_exited, pool=pool))
 
     def kill_monitors(self):
         for m in self.monitors:
             m.kill()
         self.monitors = []
+        for p in self.pools.values():
+            p.close()
+        self.pools = {}
+        report = self.telemetry.report()
+        if report:
+            logging.info(report)
+
+    def handler_exited(self, monitor, returncode, record=None):
+        self.telemetry.add(record, monitor.test)
+        if not returncode:
+            return
+        self.lock.acquire()
+        try:
+            self.errors += 1
+            self.crashed = True
+        finally:
+            self.lock.release()
+        EVENTS.notify(MONITOR_CRASHED)
 
     def check_monitors(self, finalize=True):
-        for m in self.monitors:
-            errs = m.errors
-            m.check_state()
-            if errs != m.errors:
-                self.errors += m.errors - errs
-        if self.errors and finalize:
-            self.finalize_errors()
-            raise IronbotException("Error monitors detected a crash...")
-
-    def finalize_errors(self):
-        t_total = clock()
-        first_outer_loop = True
-        while first_outer_loop or (self.FINALIZATION_TOTAL_TIMEOUT and self.FINALIZATION_TOTAL_TIMEOUT >= clock() - t_total - TIME_ACCURACY):
-            t0 = clock()
-            first_loop = False
-            while first_loop or (self.FINALIZATION_TIMEOUT and self.FINALIZATION_TIMEOUT >= clock() - t0 - TIME_ACCURACY):
-                first_loop = False
-                old_errs = self.errors
-                self.check_monitors(False)
-                if old_errs != self.errors:
-                    t0 = clock()
-                if self.FINALIZATION_TIMEOUT and self.FINALIZATION_TIMEOUT.value:
-                    sleep(WAIT_GRANULARITY)
+        if self.crashed and finalize:
+            progress = self.finalize_errors()
+            raise IronbotException("Error monitors detected a crash... (%d more error(s) handled, finalization %s)"
+                                   % (progress.errors, progress.state))
+
+    def finalize_errors(self, on_progress=None):
+        """
+        Lets the handlers deal with the rest of the errors, see Finalization.
+
+        :return: The final FinalizationProgress.
+        """
+        return Finalization(self, self.FINALIZATION_TIMEOUT, self.FINALIZATION_TOTAL_TIMEOUT).run(on_progress)
 
 
 def stop_monitoring():
@@ -0,0 +1,303 @@
+import logging
+
+try:
+    import clr
+    clr.AddReference("White.Core")
+    clr.AddReference("System")
+    clr.AddReference("System.Core")
+    clr.AddReference("UIAutomationClient")
+    clr.AddReference("UIAutomationTypes")
+
+    from White.Core.WindowsAPI.KeyboardInput import SpecialKeys
+
+    import White.Core.Application as Application
+    from System.Diagnostics import ProcessStartInfo, Process
+    import White.Core.Desktop as Desktop
+    from System.Windows.Automation import AutomationProperty, AutomationElement
+    from System.Windows.Automation import Automation, AutomationEventHandler, AutomationPropertyChangedEventHandler
+    from System.Windows.Automation import StructureChangedEventHandler, TreeScope, WindowPattern
+    from System.Windows.Automation import ControlType, OrCondition, PropertyCondition, TreeWalker
+    from System.Windows.Automation import CacheRequest, Condition
+
+    from White.Core.UIItems.Finders import SearchCriteria
+
+    from White.Core.UIItems import Button, TextBox, RadioButton, Label, CheckBox
+
+    from White.Core.UIItems.ListBoxItems import ListBox, ListItem
+    from White.Core.UIItems.TabItems import Tab, TabPage
+    from White.Core.UIItems.TreeItems import Tree, TreeNode
+    from White.Core.UIItems.MenuItems import Menu
+    from White.Core.UIItems.WindowStripControls import ToolStrip, MenuBar
+    from White.Core.UIItems.WindowItems import Window
+
+    CONTROL_TYPES = {
+        'all': None,
+        'button': Button,
+        'edit': TextBox,
+        'menu': MenuBar,
+        'list': ListBox,
+        'listitem': ListItem,
+        'radio': RadioButton,
+        'radiobutton': RadioButton,
+        'checkbox': CheckBox,
+        #'tabpage': TabPage,
+        'tab': Tab,
+        'tree': Tree,
+        'treenode': TreeNode,
+        'toolbar': ToolStrip,
+    }
+
+    #The UI Automation control types of the White items, the more derived classes first
+    ITEM_CONTROL_TYPES = (
+        (CheckBox, ControlType.CheckBox),
+        (RadioButton, ControlType.RadioButton),
+        (Button, ControlType.Button),
+        (TextBox, ControlType.Edit),
+        (Label, ControlType.Text),
+        (ListItem, ControlType.ListItem),
+        (ListBox, ControlType.List),
+        (TreeNode, ControlType.TreeItem),
+        (Tree, ControlType.Tree),
+        (Tab, ControlType.Tab),
+        (MenuBar, ControlType.MenuBar),
+        (ToolStrip, ControlType.ToolBar),
+        (Window, ControlType.Window),
+    )
+
+except:
+    from traceback import format_exc
+    logging.error(format_exc())
+
+from _backend import Backend
+from _events import EventSource, WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED, PROPERTY_CHANGED
+from _prefetch import FETCH_ALL_MIN_ELEMENTS
+from _snapshot import walk_texts, labels_first
+
+
+#White's UIItem.Id is the AutomationId of the element, so both of the names match it
+ADDITIONAL_CRITERIAS = {
+    'text': lambda v: lambda c: c.AndByText(v),
+    'automation_id':  lambda v: lambda c: c.AndAutomationId(v),
+    'id':  lambda v: lambda c: c.AndAutomationId(v),
+}
+
+
+def and_criteria(sc, criteria):
+    """
+    Appends the pushed down exact matches to a White SearchCriteria.
+
+    A stand-in with the instance methods White's SearchCriteria actually has:
+
+    >>> class SearchCriteriaStub(object):
+    ...     METHODS = ('AndByText', 'AndAutomationId', 'AndByClassName', 'AndControlType', 'AndIndex',
+    ...                'AndOfFramework', 'AndNativeProperty')
+    ...     def __init__(self):
+    ...         self.calls = []
+    ...     def __getattr__(self, name):
+    ...         if name not in self.METHODS:
+    ...             raise AttributeError(name)
+    ...         return lambda v: self.calls.append((name, v)) or self
+    >>> and_criteria(SearchCriteriaStub(), [('automation_id', 'AID_Button1'), ('id', 'AID_Edit1'),
+    ...                                     ('text', 'OK')]).calls
+    [('AndAutomationId', 'AID_Button1'), ('AndAutomationId', 'AID_Edit1'), ('AndByText', 'OK')]
+    >>> sorted(WhiteBackend.CRITERIA)
+    ['automation_id', 'id', 'text']
+
+    :param sc: a SearchCriteria.
+    :param criteria: ((attribute name, value), ...), the names are those of ADDITIONAL_CRITERIAS.
+    :return: The extended SearchCriteria.
+    """
+    for name, v in criteria:
+        sc = ADDITIONAL_CRITERIAS[name](v)(sc)
+    return sc
+
+
+class UIAEventSource(EventSource):
+    """
+    Desktop-wide UI Automation events.
+    """
+    PROPERTIES = ('NameProperty', 'AutomationIdProperty', 'IsEnabledProperty', 'IsOffscreenProperty',
+                  'HasKeyboardFocusProperty')
+
+    def __init__(self):
+        EventSource.__init__(self)
+        self.removers = []
+
+    def start(self, notify):
+        EventSource.start(self, notify)
+        root = AutomationElement.RootElement
+        for event, kind in ((WindowPattern.WindowOpenedEvent, WINDOW_OPENED),
+                            (WindowPattern.WindowClosedEvent, WINDOW_CLOSED)):
+            h = AutomationEventHandler(lambda s, e, kind=kind: notify(kind))
+            Automation.AddAutomationEventHandler(event, root, TreeScope.Subtree, h)
+            self.removers.append(lambda event=event, h=h: Automation.RemoveAutomationEventHandler(event, root, h))
+        h = StructureChangedEventHandler(lambda s, e: notify(STRUCTURE_CHANGED))
+        Automation.AddStructureChangedEventHandler(root, TreeScope.Subtree, h)
+        self.removers.append(lambda h=h: Automation.RemoveStructureChangedEventHandler(root, h))
+        h = AutomationPropertyChangedEventHandler(lambda s, e: notify(PROPERTY_CHANGED))
+        Automation.AddAutomationPropertyChangedEventHandler(root, TreeScope.Subtree, h,
+                                                            *[getattr(AutomationElement, p) for p in self.PROPERTIES])
+        self.removers.append(lambda h=h: Automation.RemoveAutomationPropertyChangedEventHandler(root, h))
+
+    def stop(self):
+        """
+        Removes the handlers added by start() only, White has handlers of its own.
+        """
+        removers, self.removers = self.removers, []
+        for remove in removers:
+            remove()
+        EventSource.stop(self)
+
+
+class WhiteBackend(Backend):
+    """
+    The real desktop, through White and UI Automation.
+    """
+    CRITERIA = tuple(ADDITIONAL_CRITERIAS)
+
+    def __init__(self):
+        self.text_walker = None
+        self.watched = set()
+
+    def launch(self, executable, params):
+        return Application.Launch(ProcessStartInfo(executable, params))
+
+    def attach(self, process):
+        return Application.Attach(process)
+
+    def watch_exit(self, app, notify):
+        p = app.Process
+        if p.Id not in self.watched:
+            p.EnableRaisingEvents = True
+            p.Exited += lambda s, e: notify()
+            self.watched.add(p.Id)
+        return True
+
+    def processes(self):
+        return [p for p in Process.GetProcesses()]
+
+    def windows(self, app=None, parent=None):
+        if app:
+            return [w for w in app.GetWindows()]
+        if parent:
+            return [w for w in parent.ModalWindows()]
+        return [w for w in Desktop.Instance.Windows()]
+
+    def get_multiple(self, parent, c_type, criteria):
+        ct = CONTROL_TYPES.get(c_type)
+        if ct:
+            sc = SearchCriteria.ByControlType(ct)
+        else:
+            sc = SearchCriteria.All
+        return [elem for elem in parent.GetMultiple(and_criteria(sc, criteria))]
+
+    def alive(self, parent, elements):
+        """
+        A single property read of the parent and of the first and the last element.
+        """
+        try:
+            for e in [parent] + elements[:1] + elements[-1:]:
+                e.AutomationElement.Current.ControlType
+            return True
+        except Exception:
+            return False
+
+    def element_key(self, element):
+        try:
+            return tuple(element.AutomationElement.GetRuntimeId())
+        except Exception:
+            return None
+
+    def identity(self, obj):
+        if hasattr(obj, 'AutomationElement'):
+            return self.element_key(obj)
+        p = getattr(obj, 'Process', obj)
+        if isinstance(p, Process):
+            try:
+                ticks = p.StartTime.Ticks
+            except Exception:
+                #No access to the start time of some of the system processes
+                ticks = None
+            return ('pid', p.Id, ticks)
+        return None
+
+    def texts(self, parent):
+        """
+        Walks the labels and the buttons in a single pass, the labels go first (as they used to).
+        """
+        yield parent.Name
+        if self.text_walker is None:
+            self.text_walker = TreeWalker(OrCondition(
+                PropertyCondition(AutomationElement.ControlTypeProperty, ControlType.Text),
+                PropertyCondition(AutomationElement.ControlTypeProperty, ControlType.Button)))
+        texts = walk_texts(parent.AutomationElement, self.text_walker.GetFirstChild,
+                           self.text_walker.GetNextSibling, self._text_of)
+        for t in labels_first(texts):
+            yield t
+
+    @staticmethod
+    def _text_of(e):
+        current = e.Current
+        return current.ControlType == ControlType.Button, current.Name
+
+    def fetch(self, root, elements, names):
+        """
+        A UI Automation cache request: a single cross-process call for the children of the desktop (root is None)
+        or for the descendants of the root (the controls of a window, or the modal windows it owns). Only the
+        elements of the control types of the candidates are cached, so the cost follows the lookup, not the size
+        of the window. If the control types are not known, the whole root is cached only for a long enough
+        list of candidates, a few are left to the single property reads.
+        """
+        condition = self._fetch_condition(elements)
+        if condition is None:
+            if len(elements) < FETCH_ALL_MIN_ELEMENTS:
+                return [None for e in elements]
+            condition = Condition.TrueCondition
+        cr = CacheRequest()
+        cr.Add(AutomationElement.RuntimeIdProperty)
+        for n in names:
+            cr.Add(getattr(AutomationElement, n + 'Property'))
+        if root is None:
+            base, scope = AutomationElement.RootElement, TreeScope.Children
+        else:
+            base, scope = root.AutomationElement, TreeScope.Descendants
+        activation = cr.Activate()
+        try:
+            found = base.FindAll(scope, condition)
+        finally:
+            activation.Dispose()
+        by_id = {}
+        for e in found:
+            rid = e.GetCachedPropertyValue(AutomationElement.RuntimeIdProperty)
+            by_id[tuple(rid)] = dict([(n, e.GetCachedPropertyValue(getattr(AutomationElement, n + 'Property')))
+                                      for n in names])
+        return [by_id.get(self.element_key(e)) for e in elements]
+
+    @staticmethod
+    def _fetch_condition(elements):
+        """
+        :return: A condition matching the control types of the elements (taken from their White classes,
+            no round trips), None if one of them is of an unknown type.
+        """
+        types = []
+        for e in elements:
+            for cls, ct in ITEM_CONTROL_TYPES:
+                if isinstance(e, cls):
+                    if ct not in types:
+                        types.append(ct)
+                    break
+            else:
+                return None
+        conditions = [PropertyCondition(AutomationElement.ControlTypeProperty, ct) for ct in types]
+        if len(conditions) == 1:
+            return conditions[0]
+        return OrCondition(*conditions)
+
+    def read(self, element, name):
+        return element.AutomationElement.GetCurrentPropertyValue(getattr(AutomationElement, name + 'Property'))
+
+    def special_key(self, name):
+        return getattr(SpecialKeys, name)
+
+    def event_source(self):
+        return UIAEventSource()
@@ -1,65 +1,50 @@
 import logging
-import re
+from traceback import format_exc
 
-try:
-    import clr
-    clr.AddReference("White.Core")
-    clr.AddReference("System")
-    clr.AddReference("System.Core")
-    clr.AddReference("UIAutomationClient")
-    clr.AddReference("UIAutomationTypes")
+from _params import Delay, fixed_val, pop, pop_re, pop_type, robot_args, pop_bool, pop_menu_path, str_2_bool, pop_polling
+from _util import IronbotException, waiting_iterator, result_modifier, error_decorator, stop_monitoring, setup_monitoring
+from _util import compile_re, get_default_polling, set_default_polling
+from _attr import AttributeDict, ATTR_FAILURES
+from _attr import attr_checker, re_checker, my_getattr, attr_reader
+from _keys import pop_key, pop_key_string
+from _events import EVENTS, PROCESS_EVENTS, UI_EVENTS, ALL_EVENTS
+from _events import WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED, PROPERTY_CHANGED, PROCESS_EXITED
+from _snapshot import SnapshotCache
+from _ctlcache import ControlCache
+from _query import plan_query
+from _backend import get_backend, BackendProperties
+from _identity import exclude, dedup, diff
+from _prefetch import PropertyCache, prop_reader, prop_checker, prop_re_checker, needed_properties
 
-    from White.Core.WindowsAPI.KeyboardInput import SpecialKeys
 
-    import White.Core.Application as Application
-    from System.Diagnostics import ProcessStartInfo, Process
-    import White.Core.Desktop as Desktop
-    from System.Windows.Automation import AutomationProperty, AutomationElement
+def _walk_texts(parent):
+    return get_backend().texts(parent)
 
-    from White.Core.UIItems.Finders import SearchCriteria
 
-    from White.Core.UIItems import Button, TextBox, RadioButton, Label, CheckBox
+def _element_key(x):
+    return get_backend().element_key(x)
 
-    from White.Core.UIItems.ListBoxItems import ListBox, ListItem
-    from White.Core.UIItems.TabItems import Tab, TabPage
-    #import White.Core.UIItems
-    #logging.warning(repr(dir(White.Core.UIItems)))
-    from White.Core.UIItems.TreeItems import Tree, TreeNode
-    #from White.Core.UIItems.WindowItems import Window, DisplayState
-    from White.Core.UIItems.MenuItems import Menu
-    from White.Core.UIItems.WindowStripControls import ToolStrip, MenuBar
-    #from White.Core.UIItems.ListBoxItems import ComboBox
-    #from White.Core.UIItems.TableItems import Table
 
-    #from System.Windows.Automation import ControlType
+TEXT_EVENTS = (WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED, PROPERTY_CHANGED)
 
-    #logging.warning(repr(dir(ControlType)))
 
+def _text_epoch():
+    if EVENTS.active:
+        return EVENTS.stamp(TEXT_EVENTS)
+    return None
 
-except:
-    from traceback import format_exc
-    logging.error(format_exc())
 
+TEXT_SNAPSHOTS = SnapshotCache(_walk_texts, key=_element_key, epoch=_text_epoch)
 
-from _params import Delay, fixed_val, pop, pop_re, pop_type, robot_args, pop_bool, pop_menu_path, str_2_bool
-from _util import IronbotException, waiting_iterator, result_modifier, error_decorator, stop_monitoring, setup_monitoring
-from _attr import AttributeDict
-from _attr import attr_checker, re_checker, my_getattr, attr_reader
-from _keys import pop_key, pop_key_string
 
 def full_text(parent):
-    labels = [i for i in parent.GetMultiple(SearchCriteria.ByControlType(Label))]
-    buttons = [i for i in parent.GetMultiple(SearchCriteria.ByControlType(Button))]
-    return [parent.Name] + [i.Text for i in labels] + [i.Name for i in buttons]
+    return TEXT_SNAPSHOTS.get(parent).texts()
 
 def wait_in_texts(x, match):
-    return match in full_text(x)
+    return TEXT_SNAPSHOTS.get(x).contains(match)
 
 def wait_re_in_texts(x, regexp):
-    for t in full_text(x):
-        if regexp.match(t):
-            return True
-    return False
+    return TEXT_SNAPSHOTS.get(x).match(regexp)
 
 
 
@@ -98,12 +83,54 @@ def on_enter_test():
     CONTROLLED_APPS.append([])
 
 
+def subscribe_ui_events():
+    if EVENTS.active:
+        return
+    try:
+        source = get_backend().event_source()
+        if source is None:
+            return
+        EVENTS.subscribe(source)
+    except Exception:
+        from traceback import format_exc
+        logging.warning('UI events are not available, the waits will poll: %s' % format_exc())
+
+
+def watch_exits(apps):
+    """
+    Makes the processes of the apps report their exit to EVENTS.
+
+    :return: True if the waits for those processes may rely on the events.
+    """
+    if not EVENTS.active:
+        return False
+    backend = get_backend()
+    try:
+        for a in apps:
+            if not backend.watch_exit(a, lambda: EVENTS.notify(PROCESS_EXITED)):
+                return False
+        return True
+    except Exception:
+        return False
+
+
+#The polling policies to restore when leaving the suites (Set Polling lasts until the end of the suite)
+SUITE_POLLING = []
+
+
 def on_enter_suite():
     CONTROLLED_APPS.append([])
+    SUITE_POLLING.append(get_default_polling())
     Delay.do_benchmarking()
+    subscribe_ui_events()
+
+
+def on_leave_keyword():
+    ATTR_FAILURES.report()
 
 
 def on_leave_test():
+    ATTR_FAILURES.report()
     for a in CONTROLLED_APPS[-1]:
         if not a.HasExited:
             logging.warning('Test teardown: an app is still running')
@@ -118,6 +145,10 @@ def on_leave_suite():
             logging.warning('Suite teardown: an app is still running')
             a.Dispose()
     del CONTROLLED_APPS[-1]
+    if SUITE_POLLING:
+        set_default_polling(SUITE_POLLING.pop())
+    if not CONTROLLED_APPS:
+        EVENTS.unsubscribe_all()
 
 
 LAUNCH_PARAMS = (
@@ -131,8 +162,24 @@ LAUNCH_PARAMS = (
 )
 
 
+PROPERTIES = PropertyCache(BackendProperties())
+
+#The properties the 'wait' attributes read, prefetched for the lookups
+CTL_PROPERTIES = {
+    'id': ('AutomationId',), 're_id': ('AutomationId',),
+    'automation_id': ('AutomationId',), 're_automation_id': ('AutomationId',),
+    'name': ('Name',), 're_name': ('Name',),
+    'enabled': ('IsEnabled',), 'disabled': ('IsEnabled',),
+}
+WND_PROPERTIES = {
+    'id': ('AutomationId',), 're_id': ('AutomationId',),
+    'automation_id': ('AutomationId',), 're_automation_id': ('AutomationId',),
+    'title': ('Name',), 're_title': ('Name',),
+}
+
+
 def get_aid(obj):
-    return obj.AutomationElement.GetCurrentPropertyValue(AutomationElement.AutomationIdProperty)
+    return PROPERTIES.read(obj, 'AutomationId')
 
 
 def check_aid(obj, v):
@@ -140,7 +187,7 @@ def check_aid(obj, v):
 
 
 def re_check_aid(obj, rexp):
-    return rexp.match(get_aid(obj)) is not None
+    return compile_re(rexp).match(get_aid(obj)) is not None
 
 
 @robot_args(LAUNCH_PARAMS)
@@ -156,9 +203,8 @@ def app_launch(executable, teardown=None, params='', _assert=False):
     :return: An application object or None in case of failure if "assert" flag is not present.
 
     """
-    pi = ProcessStartInfo(executable, params)
     try:
-        app = Application.Launch(pi)
+        app = get_backend().launch(executable, params)
     except:
         if _assert:
             logging.error('Failed to launch an executable')
@@ -181,7 +227,7 @@ def proc_list():
 
     :return: A Python list containing the process objects.
     """
-    return [p for p in Process.GetProcesses()]
+    return get_backend().processes()
 
 
 class _tchk(object):
@@ -190,13 +236,14 @@ class _tchk(object):
 
 
 def _check_automation_id(cval):
-    return lambda v: v.AutomationElement.GetCurrentPropertyValue(AutomationElement.AutomationIdProperty) == cval
+    return lambda v: get_aid(v) == cval
 
 
 def _re_check_automation_id(rexp):
+    rexp = compile_re(rexp)
     def _res(v):
         try:
-            return rexp.match(v.AutomationElement.GetCurrentPropertyValue(AutomationElement.AutomationIdProperty)) is not None
+            return rexp.match(get_aid(v)) is not None
         except:
             return False
     return _res
@@ -227,7 +274,7 @@ def _rechk(an):
     False
     """
     def _chk(reval):
-        rexp = re.compile(reval)
+        rexp = compile_re(reval)
         def _res(s):
             try:
                 return rexp.match(my_getattr(s, an)) is not None
@@ -240,9 +287,9 @@ def _rechk(an):
 PROC_ATTRS = AttributeDict()
 PROC_ATTRS.add_attr('id', '', wait=(pop,), get=())
 PROC_ATTRS.add_class_attr('Process', 'id', wait=attr_checker('Id'), get=attr_reader('Id'))
-PROC_ATTRS.add_attr('title', '', wait=(pop,), get=())
+PROC_ATTRS.add_attr('title', '', cost=5, wait=(pop,), get=())
 PROC_ATTRS.add_class_attr('Process', 'title', wait=attr_checker('MainWindowTitle'), get=attr_reader('MainWindowTitle'))
-PROC_ATTRS.add_attr('re_title', '', wait=(pop_re,))
+PROC_ATTRS.add_attr('re_title', '', cost=5, wait=(pop_re,))
 PROC_ATTRS.add_class_attr('Process', 're_title', wait=re_checker('MainWindowTitle'))
 PROC_ATTRS.add_attr('name', '', wait=(pop,), get=())
 PROC_ATTRS.add_class_attr('Process', 'name', wait=attr_checker('ProcessName'), get=attr_reader('ProcessName'))
@@ -286,12 +333,10 @@ def proc_filter(pli, none=False, number=None, single=False, _assert=False, negat
 
 
     li = list(pli)
-    attr_filters = attributes.get('wait', [])
-    for attr, params in attr_filters:
-        li = [item for item in li if attr_dict.action(item, attr, 'wait', params)]
+    li = attr_dict.compile_filter(attributes.get('wait', [])).select(li)
 
     if negative:
-        li = filter(lambda v: v not in li, pli)
+        li = exclude(pli, li)
     ok, li, msg = result_modifier(li, none=none, single=single, number=number)
 
     if not isinstance(pli, list) and isinstance(li, list):
@@ -315,6 +360,7 @@ APP_STATE_PARAMS = (
        'not_running': (('running', fixed_val(False)),),
        'kill': (('running', fixed_val(None)),),
        'timeout': (('timeout', pop_type(Delay)),),
+       'poll': (('polling', pop_polling),),
        'assert': (('_assert', fixed_val(True)),),
        'any': (('any', fixed_val(True)),),
        'all': (('all', fixed_val(True)),),
@@ -328,7 +374,7 @@ APP_STATE_PARAMS = (
 
 @robot_args(APP_STATE_PARAMS)
 @error_decorator
-def app_state(app, running=True, timeout=Delay('0s'), any=False, all=False, single=False, none=False, _assert=False, number=None):
+def app_state(app, running=True, timeout=Delay('0s'), polling=None, any=False, all=False, single=False, none=False, _assert=False, number=None):
     """
     App State | <app> | params
     :param app: required, positional -- an application object;
@@ -337,6 +383,7 @@ def app_state(app, running=True, timeout=Delay('0s'), any=False, all=False, sing
     :param kill: an optional flag -- same as not_running plus kills the app after waiting;
     :param assert: an optional flag -- fail keyword on failure;
     :param timeout: optional, followed by a delay value, e.g. *10s -- wait for the desired state.
+    :param poll: optional, followed by a polling policy, e.g. backoff:10ms:1s -- how often to check when waiting.
     :return: True if the app state at the end of waiting is as desired, otherwise False
     """
     src_app = app
@@ -348,7 +395,10 @@ def app_state(app, running=True, timeout=Delay('0s'), any=False, all=False, sing
 
     prefer_bool = all or any or single or none or not isinstance(src_app, list)
 
-    for _ in waiting_iterator(timeout):
+    events = None
+    if watch_exits(app):
+        events = PROCESS_EVENTS
+    for _ in waiting_iterator(timeout, polling, events):
         res_list = []
         for a in app:
             res_list.append(bool(a.HasExited) != bool(running))
@@ -396,7 +446,7 @@ def app_attach(processes, teardown=None):
     single = not isinstance(processes, list)
     if single:
         processes = [processes]
-    apps = [Application.Attach(p) for p in processes]
+    apps = [get_backend().attach(p) for p in processes]
     if teardown == 'test':
         CONTROLLED_APPS[-1] += apps
     elif teardown == 'suite':
@@ -410,16 +460,16 @@ WND_ATTRS = AttributeDict()
 WND_ATTRS.add_attr('keyboard', '', get=())
 WND_ATTRS.add_class_attr('Window', 'keyboard', get=lambda x: x.Keyboard)
 WND_ATTRS.add_attr('id', '', wait=(pop,), get=())
-WND_ATTRS.add_class_attr('Window', 'id', wait=attr_checker('Id'), get=lambda x: x.Id)
+WND_ATTRS.add_class_attr('Window', 'id', wait=prop_checker(PROPERTIES, 'AutomationId'), get=lambda x: x.Id)
 WND_ATTRS.add_attr('re_id', '', wait=(pop_re,),)
-WND_ATTRS.add_class_attr('Window', 're_id', wait=re_checker('Id'))
+WND_ATTRS.add_class_attr('Window', 're_id', wait=prop_re_checker(PROPERTIES, 'AutomationId'))
 WND_ATTRS.add_attr('title', '', wait=(pop,), get=())
-WND_ATTRS.add_class_attr('Window', 'title', wait=attr_checker('Name'), get=lambda x: x.Name)
+WND_ATTRS.add_class_attr('Window', 'title', wait=prop_checker(PROPERTIES, 'Name'), get=lambda x: x.Name)
 WND_ATTRS.add_attr('re_title', '', wait=(pop_re,))
-WND_ATTRS.add_class_attr('Window', 're_title', wait=re_checker('Name'))
-WND_ATTRS.add_attr('automation_id', '', wait=(pop,), get=())
+WND_ATTRS.add_class_attr('Window', 're_title', wait=prop_re_checker(PROPERTIES, 'Name'))
+WND_ATTRS.add_attr('automation_id', '', cost=10, wait=(pop,), get=())
 WND_ATTRS.add_class_attr('Window', 'automation_id', wait=check_aid, get=get_aid)
-WND_ATTRS.add_attr('re_automation_id', '', wait=(pop_re,))
+WND_ATTRS.add_attr('re_automation_id', '', cost=10, wait=(pop_re,))
 WND_ATTRS.add_class_attr('Window', 're_automation_id', wait=re_check_aid)
 WND_ATTRS.add_attr('closed', '', wait=(), get=())
 WND_ATTRS.add_class_attr('Window', 'closed', wait=lambda w: w.IsClosed, get=lambda w: w.IsClosed)
@@ -440,10 +490,10 @@ WND_ATTRS.add_class_attr('Window', 'menu', get=lambda w: w.MenuBar)
 WND_ATTRS.add_attr('texts', '', get=(),)
 WND_ATTRS.add_class_attr('Window', 'texts', get=full_text)
 
-WND_ATTRS.add_attr('in_texts', '', wait=(pop,),)
+WND_ATTRS.add_attr('in_texts', '', cost=100, wait=(pop,),)
 WND_ATTRS.add_class_attr('Window', 'in_texts', wait=wait_in_texts)
 
-WND_ATTRS.add_attr('re_in_texts', '', wait=(pop_re,),)
+WND_ATTRS.add_attr('re_in_texts', '', cost=100, wait=(pop_re,),)
 WND_ATTRS.add_class_attr('Window', 're_in_texts', wait=wait_re_in_texts)
 
 WND_ATTRS.add_attr('merged_texts', '', get=(),)
@@ -463,22 +513,27 @@ WND_FILTER_PARAMS = (
 )
 
 
-def _wnd_filter(wlist, single=False, negative=False, none=False, number=None, attributes={}, _assert=False, attr_dict=None):
+def _wnd_filter(wlist, single=False, negative=False, none=False, number=None, attributes={}, _assert=False, attr_dict=None, prefetch=False, root=None):
     """
         Wnd Filter | <list> | params and attributes
 
     Filters windows from a list by attributes.
 
+    :param prefetch: (not a keyword parameter) all of the windows are found in the root (None for the desktop),
+        so their properties may be prefetched in one request. The windows of a list from elsewhere are not.
     :return List (or a single window if "single" is given).
     """
     li = list(wlist)
-    attr_filters = attributes.get('wait', [])
-
-    for attr, params in attr_filters:
-        li = [item for item in li if attr_dict.action(item, attr, 'wait', params)]
+    filters = attributes.get('wait', [])
+    if prefetch and len(li) > 1:
+        PROPERTIES.prefetch(root, li, needed_properties(filters, WND_PROPERTIES))
+    try:
+        li = attr_dict.compile_filter(filters).select(li)
+    finally:
+        PROPERTIES.clear()
 
     if negative:
-        li = filter(lambda v: v not in li, wlist)
+        li = exclude(wlist, li)
 
     ok, res, msg = result_modifier(li, src_list=wlist, none=none, single=single, number=number)
     #logging.warning("FILTERING: %s" % repr((ok, res, msg, wlist)))
@@ -501,6 +556,7 @@ WND_GET_PARAMS = (
        'app': (('app', pop),),
        'parent': (('parent', pop),),
        'timeout': (('timeout', pop_type(Delay)),),
+       'poll': (('polling', pop_polling),),
        'single': (('single', fixed_val(True)),),
        'number': (('number', pop_type(int)),),
        'none': (('none', fixed_val(True)),),
@@ -528,23 +584,18 @@ def wnd_get(app=None, parent=None, attr_dict=None, **kw):
     """
     if app and parent:
         raise IronbotException("You may specify either 'app' or 'parent' parameter, not both")
-    timeout = kw.get('timeout', None)
-    if 'timeout' in kw:
-        del kw['timeout']
-    for _ in waiting_iterator(timeout):
+    timeout = kw.pop('timeout', None)
+    polling = kw.pop('polling', None)
+    for _ in waiting_iterator(timeout, polling, UI_EVENTS):
         exc, res = None, None
         try:
             try:
-                if app:
-                    wnd_list = [w for w in app.GetWindows()]
-                elif parent:
-                    wnd_list = [w for w in parent.ModalWindows()]
-                else:
-                    wnd_list = [w for w in Desktop.Instance.Windows()]
+                wnd_list = get_backend().windows(app=app, parent=parent)
             except:
                 logging.error("Wnd Get: unable to obtain wnd_list: %s" % format_exc())
                 wnd_list = []
-            res = _wnd_filter(wnd_list, attr_dict=attr_dict, **kw)
+            #The windows of an app have no common parent element to prefetch their properties in
+            res = _wnd_filter(wnd_list, attr_dict=attr_dict, prefetch=not app, root=parent, **kw)
         except Exception, e:
             exc = e
         if res:
@@ -563,48 +614,23 @@ def wnd_close(li):
     return li
 """
 
-ADDITIONAL_CRITERIAS = {
-    'text': lambda v: lambda c: c.AndByText(v),
-    'automation_id':  lambda v: lambda c: c.AndByAutomationId(v),
-    'id':  lambda v: lambda c: c.AndById(v),
-}
-
-
-CONTROL_TYPES = {
-    'all': None,
-    'button': Button,
-    'edit': TextBox,
-    'menu': MenuBar,
-    'list': ListBox,
-    'listitem': ListItem,
-    'radio': RadioButton,
-    'radiobutton': RadioButton,
-    'checkbox': CheckBox,
-    #'tabpage': TabPage,
-    'tab': Tab,
-    'tree': Tree,
-    'treenode': TreeNode,
-    'toolbar': ToolStrip,
-}
-
-
 CTL_ATTRS = AttributeDict()
 CTL_ATTRS.add_attr('id', '', wait=(pop,), get=())
-CTL_ATTRS.add_class_attr('UIItem', 'id', wait=attr_checker('Id'), get=lambda x: x.Id)
+CTL_ATTRS.add_class_attr('UIItem', 'id', wait=prop_checker(PROPERTIES, 'AutomationId'), get=lambda x: x.Id)
 CTL_ATTRS.add_attr('re_id', '', wait=(pop_re,))
-CTL_ATTRS.add_class_attr('UIItem', 're_id', wait=re_checker('Id'))
+CTL_ATTRS.add_class_attr('UIItem', 're_id', wait=prop_re_checker(PROPERTIES, 'AutomationId'))
 CTL_ATTRS.add_attr('name', '', wait=(pop,), get=())
-CTL_ATTRS.add_class_attr('UIItem', 'name', wait=attr_checker('Name'), get=lambda x: x.Name)
+CTL_ATTRS.add_class_attr('UIItem', 'name', wait=prop_checker(PROPERTIES, 'Name'), get=lambda x: x.Name)
 CTL_ATTRS.add_attr('re_name', '', wait=(pop_re,))
-CTL_ATTRS.add_class_attr('UIItem', 're_name', wait=re_checker('Name'))
-CTL_ATTRS.add_attr('automation_id', '', wait=(pop,), get=())
-CTL_ATTRS.add_class_attr('UIItem', 'automation_id', wait=check_aid, get=lambda x: x.AutomationElement.GetCurrentPropertyValue(AutomationElement.AutomationIdProperty))
-CTL_ATTRS.add_attr('re_automation_id', '', wait=(pop_re,))
+CTL_ATTRS.add_class_attr('UIItem', 're_name', wait=prop_re_checker(PROPERTIES, 'Name'))
+CTL_ATTRS.add_attr('automation_id', '', cost=10, wait=(pop,), get=())
+CTL_ATTRS.add_class_attr('UIItem', 'automation_id', wait=check_aid, get=get_aid)
+CTL_ATTRS.add_attr('re_automation_id', '', cost=10, wait=(pop_re,))
 CTL_ATTRS.add_class_attr('UIItem', 're_automation_id', wait=re_check_aid)
 CTL_ATTRS.add_attr('enabled', '', get=(), wait=())
-CTL_ATTRS.add_class_attr('UIItem', 'enabled', get=lambda x: x.Enabled, wait=lambda x: x.Enabled)
+CTL_ATTRS.add_class_attr('UIItem', 'enabled', get=lambda x: x.Enabled, wait=prop_reader(PROPERTIES, 'IsEnabled'))
 CTL_ATTRS.add_attr('disabled', '', get=(), wait=())
-CTL_ATTRS.add_class_attr('UIItem', 'disabled', get=lambda x: not x.Enabled, wait=lambda x: not x.Enabled)
+CTL_ATTRS.add_class_attr('UIItem', 'disabled', get=lambda x: not x.Enabled, wait=lambda x: not PROPERTIES.read(x, 'IsEnabled'))
 
 
 CTL_ATTRS.add_attr('click', '', do=(), get=())
@@ -704,7 +730,7 @@ CTL_ATTRS.add_class_attr('ListBox', 'selected', get=listbox_get_selected, set=li
 CTL_ATTRS.add_class_attr('TreeNode', 'selected', get=lambda x: x.IsSelected, set=lambda x, v: x.Select() if str_2_bool(v) else x.UnSelect())
 CTL_ATTRS.add_attr('idx_selected', '', get=(), set=(pop_type(int),))
 CTL_ATTRS.add_class_attr('ListBox', 'idx_selected', get=listbox_get_selected_idx, set=lambda x, i: x.Select(i))
-CTL_ATTRS.add_attr('num_items', '', get=(), wait=(pop_type(int),))
+CTL_ATTRS.add_attr('num_items', '', cost=10, get=(), wait=(pop_type(int),))
 CTL_ATTRS.add_class_attr('ListBox', 'num_items', get=lambda x: len(x.Items), wait=lambda x, n: n == len(x.Items))
 CTL_ATTRS.add_attr('listitems', '', get=())
 CTL_ATTRS.add_class_attr('ListBox', 'listitems', get=lambda x: [i for i in x.Items])
@@ -739,18 +765,46 @@ CTL_GET_PARAMS = (
        'list':  (('src_li', pop),),
        'negative': (('negative', fixed_val(True)),),
        'timeout': (('timeout', pop_type(Delay)),),
+       'poll': (('polling', pop_polling),),
        'index': (('index', pop_type(int)),),
        'single': (('single', fixed_val(True)),),
        'none': (('none', fixed_val(True)),),
        'number': (('number', pop_type(int)),),
        'assert': (('_assert', fixed_val(True)),),
+       'refresh': (('refresh', fixed_val(True)),),
+       'cached': (('cached', fixed_val(True)),),
        'failure_text': (('failure_text', pop),),
 })
 
 
+def _fetch_controls(parent, query):
+    """
+    :param query: (control type name, ((attribute name, value), ...)) -- the attributes are matched
+        by the backend, see Backend.CRITERIA.
+    """
+    c_type, native = query
+    return get_backend().get_multiple(parent, c_type, native)
+
+
+def _controls_alive(parent, elements):
+    return get_backend().alive(parent, elements)
+
+
+STRUCTURE_EVENTS = (WINDOW_OPENED, WINDOW_CLOSED, STRUCTURE_CHANGED)
+
+
+def _structure_epoch():
+    if EVENTS.active:
+        return EVENTS.stamp(STRUCTURE_EVENTS)
+    return None
+
+
+CONTROLS = ControlCache(_fetch_controls, key=_element_key, validate=_controls_alive, epoch=_structure_epoch)
+
+
 @robot_args(CTL_GET_PARAMS, CTL_ATTRS, insert_attr_dict=True)
 @error_decorator
-def ctl_get(c_type, parent=None, src_li=None, timeout=Delay('0s'), number=None, negative=False, single=False, none=False, _assert=False, index=None, attributes={}, attr_dict=None):
+def ctl_get(c_type, parent=None, src_li=None, timeout=Delay('0s'), polling=None, number=None, negative=False, single=False, none=False, _assert=False, index=None, refresh=False, cached=False, attributes={}, attr_dict=None):
     """
     Ctl Get | <c_type> [| <parent>/<src_li> ] | attributes & paramsa
     :param c_type: control type name (all, button, edit, menu, list, listitem, radio, radiobutton,
@@ -758,30 +812,38 @@ def ctl_get(c_type, parent=None, src_li=None, timeout=Delay('0s'), number=None,
     :param parent: an optional named parameter, parent window. Incompatible with src_li
     :param src_li: an optional named parameter, a list of controls to filter.
     :param negative: inverts filtering
+    :param refresh: do not reuse the controls found in the parent by the previous calls
+    :param cached: an optional flag -- the first check may reuse the controls found in the parent by a previous
+            call: within a second, or for longer if the UI events show no changes of the parent (by default
+            the parent is searched again every time)
     :return:
     """
-    ct = CONTROL_TYPES.get(c_type)
-    if ct:
-        criteria = SearchCriteria.ByControlType(CONTROL_TYPES.get(c_type))
-    else:
-        criteria = SearchCriteria.All
-    attr_filters = attributes.get('wait', [])
-    for _ in waiting_iterator(timeout):
+    #Exact matches are left to the provider when searching in a parent, the rest is checked here
+    plan = plan_query(attributes.get('wait', []), get_backend().CRITERIA, pushdown=bool(parent) and not negative)
+    attr_filter = attr_dict.compile_filter(plan.residual)
+    first_loop = True
+    for _ in waiting_iterator(timeout, polling, UI_EVENTS):
         if parent:
             #logging.warning(repr(parent) + repr(dir(parent)))
 
             if isinstance(parent, list):
                 raise IronbotException("Ctl Get: 'parent' should contain a single window, not a list (check if there is a 'single' or 'index' parameter when searching for that window).")
-            mult = parent.GetMultiple(criteria)
-            li = [elem for elem in mult]
+            #Only the first check of an opted in call may trust the cache
+            li = CONTROLS.get(parent, (c_type, plan.native), refresh=refresh, trust=cached and first_loop)
+            first_loop = False
         elif src_li:
             li = list(src_li)
 
-        for attr, params in attr_filters:
-            li = [item for item in li if attr_dict.action(item, attr, 'wait', params)]
+        #One cache request for the properties the filters read, instead of a round trip per control
+        if parent and len(li) > 1:
+            PROPERTIES.prefetch(parent, li, needed_properties(plan.residual, CTL_PROPERTIES))
+        try:
+            li = attr_filter.select(li)
+        finally:
+            PROPERTIES.clear()
 
         if negative:
-            li = filter(lambda v: v not in li, src_li)
+            li = exclude(src_li, li)
 
         ok, res, msg = result_modifier(li, src_list=src_li, single=single, none=none, number=number, index=index)
         if ok:
@@ -794,7 +856,7 @@ def ctl_get(c_type, parent=None, src_li=None, timeout=Delay('0s'), number=None,
 
 
 CTL_ATTR_PARAMS = ((pop,), {'timeout': (('timeout', pop_type(Delay)),), 'assert': (('_assert', fixed_val(True)),),
-                            'failure_text': (('failure_text', pop),),})
+                            'poll': (('polling', pop_polling),), 'failure_text': (('failure_text', pop),),})
 WND_ATTR_PARAMS = CTL_ATTR_PARAMS
 PROC_ATTR_PARAMS = CTL_ATTR_PARAMS
 
@@ -805,7 +867,7 @@ def _dict_pop(d, name, default):
     return res
 
 @error_decorator
-def _attr(controls, attributes, attr_dict, timeout=Delay('0s'), _assert=False):
+def _attr(controls, attributes, attr_dict, timeout=Delay('0s'), polling=None, _assert=False):
     """
     Kbd/Ctl/Proc/Wnd Attr | <objects> | parameters & attributes
 
@@ -830,14 +892,11 @@ def _attr(controls, attributes, attr_dict, timeout=Delay('0s'), _assert=False):
 
 
     success = True
+    wait_filter = attr_dict.compile_filter(waits)
 
-    for _ in waiting_iterator(timeout):
+    for _ in waiting_iterator(timeout, polling, ALL_EVENTS):
         #logging.warning("CHECKING %s" % repr(timeout.value))
-        success = True
-        for c in ctls:
-            for a, p in waits:
-                if not attr_dict.action(c, a, 'wait', p):
-                    success = False
+        success = len(wait_filter.select(ctls)) == len(ctls)
         if success:
             break
 
@@ -846,6 +905,7 @@ def _attr(controls, attributes, attr_dict, timeout=Delay('0s'), _assert=False):
             raise IronbotTimeoutException('Error: Attribute timeout')
         logging.warning('Error: Attribute timeout')
 
+    #Some of the 'get' actions click, so they are still performed control by control
     res = []
     for c in ctls:
         ctl_gets = []
@@ -855,17 +915,16 @@ def _attr(controls, attributes, attr_dict, timeout=Delay('0s'), _assert=False):
             ctl_gets = ctl_gets[0]
         res.append(ctl_gets)
 
-    #res = [(lambda li: li[0] if len(gets) == 1 else li)
-    #       ([attr_dict.action(c, a, 'get', p) for a, p in gets]) for c in ctls]
-
     for k, v in others.iteritems():
         for a, p in v:
-            for c in ctls:
-                attr_dict.action(c, a, k, p)
+            attr_dict.action_many(ctls, a, k, p)
 
     for a, p in sets:
-        for c in ctls:
-            attr_dict.action(c, a, 'set', p)
+        attr_dict.action_many(ctls, a, 'set', p)
+
+    #The actions (even some 'get' ones) may change the UI, the controls found before cannot be trusted
+    if gets or others or sets:
+        CONTROLS.invalidate()
 
     if single:
         return res[0]
@@ -874,23 +933,84 @@ def _attr(controls, attributes, attr_dict, timeout=Delay('0s'), _assert=False):
 
 
 DREAM_PARAMS = (
-    (pop_type(Delay),), {})
+    (pop_type(Delay),), {'poll': (('polling', pop_polling),),})
 
 
 @robot_args(DREAM_PARAMS, AttributeDict(), insert_attr_dict=False)
-def dream(delay):
+def dream(delay, polling=None):
     """
-    Dream | <delay>
+    Dream | <delay> [| poll | <policy>]
 
     Waits for a given period of tima, and checks for events from error handlers when waiting.
 
     :param delay:
+    :param poll: optional, followed by a polling policy -- how often to check for the events.
     :return: None
     """
-    for _ in waiting_iterator(delay):
+    for _ in waiting_iterator(delay, polling):
         pass
 
 
+SET_POLLING_PARAMS = ((pop_polling,), {})
+
+
+@robot_args(SET_POLLING_PARAMS, AttributeDict(), insert_attr_dict=False)
+def set_polling(polling):
+    """
+    Set Polling | <policy>
+
+    Sets the polling policy of the waiting keywords that are not given a 'poll' parameter, until the end
+    of the current suite (e.g. in a suite setup). The policy is 'fixed' by default.
+
+    :param policy: a polling policy specification, e.g. 'backoff' or 'fixed:500ms'.
+    :return: None
+    """
+    set_default_polling(polling)
+
+
+LIST_DEDUP_PARAMS = ((pop,), {})
+
+
+@robot_args(LIST_DEDUP_PARAMS, AttributeDict(), insert_attr_dict=False)
+def list_dedup(li):
+    """
+    List Dedup | <list>
+
+    Removes the repeated objects from a list of processes, windows or controls (the same window found twice is
+    the same object, even if the objects in the list are different).
+
+    :return: A new list, the first one of the repeated objects is kept.
+    """
+    return dedup(li)
+
+
+LIST_DIFF_PARAMS = (
+    (pop, pop), {
+       'added': (('part', fixed_val('added')),),
+       'removed': (('part', fixed_val('removed')),),
+    }
+)
+
+
+@robot_args(LIST_DIFF_PARAMS, AttributeDict(), insert_attr_dict=False)
+def list_diff(old, new, part=None):
+    """
+    List Diff | <old list> | <new list> [| added/removed ]
+
+    Compares two lists of processes, windows or controls, e.g. the windows before and after an action.
+
+    :param added: an optional flag -- return only the objects of the new list that are not in the old one.
+    :param removed: an optional flag -- return only the objects of the old list that are not in the new one.
+    :return: A list of two lists: [added objects, removed objects].
+    """
+    added, removed = diff(old, new)
+    if part == 'added':
+        return added
+    if part == 'removed':
+        return removed
+    return [added, removed]
+
+
 SETUP_MON_PARAMS = (
     (pop_type(Delay), pop_type(Delay), pop, pop_menu_path), {})
 
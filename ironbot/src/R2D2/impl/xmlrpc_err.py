@@ -1,20 +1,234 @@
-import datetime
-from SimpleXMLRPCServer import SimpleXMLRPCServer
+"""
+A local registry of error windows: the error handlers register the error windows they detect, the main process
+subscribes to the changes (a long poll) instead of polling for them.
+
+Error window descriptors are XML-RPC values (usually structs like {'title': ..., 'pid': ...}); equal descriptors
+are the same window, registering it again increments its reference count.
+
+>>> service = RegistryService(port=0)
+>>> service.start()
+>>> handler, main = RegistryClient(service.url), RegistryClient(service.url)
+>>> main.subscribe(0.01)
+([], None)
+>>> w = {'title': 'Error', 'pid': 12}
+>>> handler.register(w), handler.register(w), handler.register('Another error')
+(1, 2, 1)
+>>> [(e['event'], e['refs'], e['window'] == w) for e in main.subscribe(1.0)[0]]
+[('registered', 1, True), ('registered', 2, True), ('registered', 1, False)]
+>>> res = handler.batch([('unregister_error_window', w), ('unregister_error_window', 'Another error'), ('error_windows',)])
+>>> res[:2], res[2] == [{'window': w, 'refs': 1}]
+([1, 0], True)
+>>> handler.unregister('Unknown')
+-1
+>>> changes, windows = main.subscribe(1.0); len(changes), windows
+(2, None)
+>>> service.stop()
+
+A subscriber that falls behind by more than max_changes gets the whole state:
+
+>>> service = RegistryService(port=0, registry=ErrorWindowRegistry(max_changes=2))
+>>> service.start()
+>>> handler, main = RegistryClient(service.url), RegistryClient(service.url)
+>>> [handler.register(t) for t in ('A', 'B', 'C')], handler.unregister('A')
+([1, 1, 1], 0)
+>>> changes, windows = main.subscribe(1.0)
+>>> len(changes), sorted([(e['window'], e['refs']) for e in windows])
+(2, [('B', 1), ('C', 1)])
+>>> handler.register('D'), main.subscribe(1.0)[1]
+(1, None)
+>>> service.stop()
+"""
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from SocketServer import ThreadingMixIn
+from collections import deque
+import sys
+import threading
 import xmlrpclib
 
-ERROR_WINDOWS = {}
+from _clock import get_clock
+
+DEFAULT_PORT = 8000
+#A subscriber that falls behind by more than that many changes gets the whole state again
+MAX_CHANGES = 1000
+MAX_SUBSCRIBE_TIMEOUT = 60.0
+
+
+def _key(window):
+    if isinstance(window, dict):
+        return repr(sorted(window.items()))
+    return repr(window)
+
+
+class ErrorWindowRegistry(object):
+    """
+    Reference-counted error window descriptors. Every change gets a sequence number, so that the subscribers
+    can ask for the changes after the last one they have seen.
+    """
+    def __init__(self, max_changes=MAX_CHANGES):
+        self.cond = threading.Condition()
+        self.windows = {}
+        self.seq = 0
+        self.changes = deque(maxlen=max_changes)
+
+    def _changed(self, event, window, refs):
+        self.seq += 1
+        self.changes.append({'seq': self.seq, 'event': event, 'window': window, 'refs': refs})
+        self.cond.notifyAll()
+
+    def register(self, window):
+        """
+        :return: The reference count of the window after registering.
+        """
+        self.cond.acquire()
+        try:
+            k = _key(window)
+            entry = self.windows.setdefault(k, [window, 0])
+            entry[1] += 1
+            self._changed('registered', window, entry[1])
+            return entry[1]
+        finally:
+            self.cond.release()
+
+    def unregister(self, window):
+        """
+        :return: The reference count of the window left, -1 if it has not been registered.
+        """
+        self.cond.acquire()
+        try:
+            k = _key(window)
+            entry = self.windows.get(k)
+            if entry is None:
+                return -1
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.windows[k]
+            self._changed('unregistered', window, max(0, entry[1]))
+            return max(0, entry[1])
+        finally:
+            self.cond.release()
+
+    def snapshot(self):
+        self.cond.acquire()
+        try:
+            return [{'window': w, 'refs': refs} for w, refs in self.windows.values()]
+        finally:
+            self.cond.release()
+
+    def subscribe(self, since, timeout):
+        """
+        Waits until there are changes after the 'since' sequence number, or the timeout (seconds) passes.
+
+        :return: {'seq': the last sequence number, 'changes': [...]}; if the changes after 'since' are lost
+            already, there is also 'windows' with the current state.
+        """
+        clock = get_clock()
+        timeout = min(max(0.0, float(timeout)), MAX_SUBSCRIBE_TIMEOUT)
+        deadline = clock.now() + timeout
+        self.cond.acquire()
+        try:
+            while self.seq <= since:
+                remaining = deadline - clock.now()
+                if remaining <= 0:
+                    break
+                clock.wait(self.cond, remaining)
+            res = {'seq': self.seq, 'changes': [c for c in self.changes if c['seq'] > since]}
+            if self.changes and self.changes[0]['seq'] > since + 1:
+                res['windows'] = [{'window': w, 'refs': refs} for w, refs in self.windows.values()]
+            return res
+        finally:
+            self.cond.release()
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/', '/RPC2')
+
+
+class ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RegistryService(object):
+    """
+    The registry served over XML-RPC on localhost, a thread per request (so that the long polls do not block
+    the registrations). Supports system.multicall.
+    """
+    def __init__(self, host='localhost', port=DEFAULT_PORT, registry=None):
+        self.registry = registry or ErrorWindowRegistry()
+        self.server = ThreadedXMLRPCServer((host, port), requestHandler=_RequestHandler, logRequests=False,
+                                           allow_none=True, encoding='utf8')
+        self.server.register_introspection_functions()
+        self.server.register_multicall_functions()
+        self.server.register_function(self.registry.register, 'register_error_window')
+        self.server.register_function(self.registry.unregister, 'unregister_error_window')
+        self.server.register_function(self.registry.snapshot, 'error_windows')
+        self.server.register_function(self.registry.subscribe, 'subscribe')
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='ErrorWindowRegistry')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+
+class RegistryClient(object):
+    """
+    A client of the registry service. Not thread-safe: a client per thread.
+    """
+    def __init__(self, url):
+        self.proxy = xmlrpclib.ServerProxy(url, allow_none=True)
+        self.seq = 0
+
+    def register(self, window):
+        return self.proxy.register_error_window(window)
+
+    def unregister(self, window):
+        return self.proxy.unregister_error_window(window)
+
+    def windows(self):
+        return self.proxy.error_windows()
+
+    def subscribe(self, timeout):
+        """
+        A long poll: waits up to the timeout for the changes since the previous call.
+
+        :return: (changes, windows) -- windows is None, or the whole current state ([{'window': ..., 'refs': ...}])
+            if the client has fallen too far behind and some of the changes are lost.
+        """
+        res = self.proxy.subscribe(self.seq, timeout)
+        self.seq = res['seq']
+        return res['changes'], res.get('windows')
+
+    def batch(self, calls):
+        """
+        Makes several calls in a single request.
 
-def register_error_window(w_info):
-    today = datetime.datetime.today()
-    return xmlrpclib.DateTime(today)
+        :param calls: [(method name, arg1, ...)]
+        :return: The list of the results.
+        """
+        multicall = xmlrpclib.MultiCall(self.proxy)
+        for c in calls:
+            getattr(multicall, c[0])(*c[1:])
+        return list(multicall())
 
-def unregister_error_window(w_info):
-    if w_info in ERROR_WINDOWS:
-        ERROR_WINDOWS[w_info] -= 1
-        if ERROR_WINDOWS[w_info] <= 0:
-        del ERROR_WINDOWS[w_info]
-        return True
 
-server = SimpleXMLRPCServer(("localhost", 8000), encoding='utf8')
-server.register_function(today, "today")
-server.serve_forever()
+if __name__ == "__main__":
+    port = DEFAULT_PORT
+    if len(sys.argv) > 1:
+        port = int(sys.argv[1])
+    RegistryService(port=port).serve_forever()
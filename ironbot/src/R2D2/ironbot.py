@@ -3,7 +3,8 @@ from impl._white_core import proc_list, proc_filter, proc_attr
 from impl._white_core import wnd_get, wnd_filter, wnd_attr
 from impl._white_core import ctl_get, ctl_attr
 from impl._white_core import setup_monitors, finalize_monitors
-from impl._white_core import kbd_attr, dream
+from impl._white_core import kbd_attr, dream, set_polling
+from impl._white_core import list_dedup, list_diff
 
 ROBOT_LIBRARY_SCOPE = 'GLOBAL'
 
@@ -24,6 +25,10 @@ class _Listener:
         from impl._white_core import on_enter_test
         on_enter_test()
 
+    def end_keyword(self, name, attrs):
+        from impl._white_core import on_leave_keyword
+        on_leave_keyword()
+
     def end_test(self, name, attrs):
         import logging
         from impl._white_core import on_leave_test
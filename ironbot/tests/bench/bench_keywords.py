@@ -0,0 +1,351 @@
+#Keyword overhead benchmarks on the simulated desktop, with regression baselines.
+#
+#The pure-Python paths every keyword runs (argument parsing, attribute actions, result checks, filtering, delays,
+#waiting) are timed at synthetic scales, alone and through the keywords exported by ironbot.py. The times are
+#normalized by the time of the host calibration busy loop (timed next to each measurement, as the speed of
+#a shared computer drifts), so the baselines stored in baselines.json hold on a slower or a faster computer too
+#(but not across Python implementations: there is a set of baselines per implementation). The small scales
+#are noisier, so they are allowed a larger slowdown, and a slowdown under NOISE_FLOOR is never a regression.
+#
+#Run from this directory:
+#    python bench_keywords.py                 -- compare with the baselines, exit code 1 on a regression
+#    python bench_keywords.py --update        -- store the results as the new baselines
+#    python bench_keywords.py --scales 10,1000 --only kw. --threshold 0.5
+
+import sys
+import json
+import platform
+from optparse import OptionParser
+from os.path import dirname, abspath, join
+from timeit import Timer
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', 'src'))
+
+from R2D2 import ironbot
+from R2D2.impl._backend import set_backend
+from R2D2.impl._calibrate import busy_loop, CALIBRATION_ITERATIONS
+from R2D2.impl._clock import VirtualClock, set_clock
+from R2D2.impl._identity import exclude
+from R2D2.impl._params import Delay, robot_args
+from R2D2.impl._simdesk import SimBackend, SimDesktop
+from R2D2.impl._util import result_modifier, waiting_iterator
+from R2D2.impl._white_core import CTL_GET_PARAMS, CTL_ATTRS, WND_ATTRS, PROC_ATTRS, do_filtering, _wnd_filter
+
+
+BASELINES = join(dirname(abspath(__file__)), 'baselines.json')
+SCALES = (10, 1000, 100000)
+#A regression is a normalized time that much above the baseline (by scale, THRESHOLD for the other scales)...
+THRESHOLD = 0.25
+SCALE_THRESHOLDS = {10: 0.6, 1000: 0.4}
+#...and at least that much slower in absolute terms (seconds per run)
+NOISE_FLOOR = 50e-6
+#Each measurement runs the scenario at least that long (seconds), the median of REPEAT measurements counts
+MIN_TIME = 0.2
+REPEAT = 5
+
+SCENARIOS = []
+
+
+def scenario(name, max_scale=None):
+    """
+    Registers a scenario: a function of the scale that sets things up and returns the callable to time.
+    max_scale skips the scales a scenario is too slow for.
+    """
+    def reg(setup):
+        SCENARIOS.append((name, max_scale, setup))
+        return setup
+    return reg
+
+
+def desktop(n_apps=1, n_windows=0, n_controls=0):
+    desk = SimDesktop(apps=n_apps, windows=n_windows, controls=n_controls)
+    set_backend(SimBackend(desk))
+    return desk
+
+
+def controls(n):
+    desk = desktop(n_windows=1, n_controls=n)
+    wnd = desk.windows[0]
+    return wnd, [c for c in wnd.descendants() if type(c).__name__ != 'Panel']
+
+
+@scenario('robot_args')
+def _(n):
+    f = robot_args(CTL_GET_PARAMS, CTL_ATTRS, insert_attr_dict=True)(lambda *a, **kw: None)
+    wnd = object()
+    calls = [('button', 'parent', wnd, 'name', 'Button %d' % (i % 100), 'single') for i in range(n)]
+
+    def run():
+        for a in calls:
+            f(*a)
+    return run
+
+
+@scenario('attr_action')
+def _(n):
+    wnd, ctls = controls(n)
+
+    def run():
+        for c in ctls:
+            CTL_ATTRS.action(c, 'name', 'get', [])
+    return run
+
+
+@scenario('result_modifier')
+def _(n):
+    li = range(n)
+
+    def run():
+        result_modifier(li, src_list=li, number=n)
+        result_modifier(li, src_list=li, index=n // 2)
+        result_modifier(li[:1], src_list=li, single=True)
+    return run
+
+
+@scenario('do_filtering')
+def _(n):
+    li = range(n)
+    return lambda: do_filtering(li, lambda x: x % 2, lambda x: x % 3)
+
+
+@scenario('filter.proc')
+def _(n):
+    desk = desktop(n_apps=n)
+    f = PROC_ATTRS.compile_filter([('name', ['app7'])])
+    return lambda: f.select(desk.processes)
+
+
+@scenario('filter.wnd')
+def _(n):
+    desk = desktop(n_apps=1, n_windows=n)
+    attributes = {'wait': [('title', ['Window 7'])]}
+    return lambda: _wnd_filter(desk.windows, attributes=attributes, attr_dict=WND_ATTRS, prefetch=True)
+
+
+@scenario('filter.ctl')
+def _(n):
+    wnd, ctls = controls(n)
+    f = CTL_ATTRS.compile_filter([('re_name', ['Button 7.*']), ('enabled', [])])
+    return lambda: f.select(ctls)
+
+
+@scenario('filter.ctl.negative')
+def _(n):
+    wnd, ctls = controls(n)
+    f = CTL_ATTRS.compile_filter([('re_name', ['Button.*'])])
+    return lambda: exclude(ctls, f.select(ctls))
+
+
+@scenario('delay')
+def _(n):
+    specs = ['~%ds' % (i % 60) for i in range(n)]
+    return lambda: [Delay(s) for s in specs]
+
+
+@scenario('waiting_iterator')
+def _(n):
+    timeout = Delay('0s')
+
+    def run():
+        for i in xrange(n):
+            for _ in waiting_iterator(timeout):
+                pass
+    return run
+
+
+@scenario('kw.proc_filter')
+def _(n):
+    desk = desktop(n_apps=n)
+    return lambda: ironbot.proc_filter(desk.processes, 'name', 'app7')
+
+
+@scenario('kw.wnd_filter')
+def _(n):
+    desk = desktop(n_apps=1, n_windows=n)
+    return lambda: ironbot.wnd_filter(desk.windows, 'title', 'Window 7')
+
+
+@scenario('kw.wnd_get')
+def _(n):
+    desktop(n_apps=1, n_windows=n)
+    return lambda: ironbot.wnd_get('title', 'Window 7', 'single')
+
+
+@scenario('kw.ctl_get')
+def _(n):
+    wnd, ctls = controls(n)
+    return lambda: ironbot.ctl_get('all', 'parent', wnd, 're_name', 'Button 7.*')
+
+
+@scenario('kw.ctl_get.list')
+def _(n):
+    wnd, ctls = controls(n)
+    return lambda: ironbot.ctl_get('all', 'list', ctls, 'name', 'Button 5')
+
+
+@scenario('kw.ctl_get.negative')
+def _(n):
+    wnd, ctls = controls(n)
+    return lambda: ironbot.ctl_get('all', 'list', ctls, 're_name', 'Button.*', 'negative')
+
+
+@scenario('kw.list_dedup')
+def _(n):
+    wnd, ctls = controls(n)
+    li = ctls + ctls[::2]
+    return lambda: ironbot.list_dedup(li)
+
+
+@scenario('kw.list_diff')
+def _(n):
+    wnd, ctls = controls(n)
+    old, new = ctls[:n // 2 + 1], ctls[n // 4:]
+    return lambda: ironbot.list_diff(old, new)
+
+
+@scenario('kw.ctl_attr')
+def _(n):
+    wnd, ctls = controls(n)
+    return lambda: ironbot.ctl_attr(ctls, 'name')
+
+
+@scenario('kw.dream')
+def _(n):
+    def run():
+        for i in xrange(n):
+            ironbot.dream('0s')
+    return run
+
+
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def run_count(t):
+    """
+    :return: The number of runs of a Timer that take at least MIN_TIME.
+    """
+    number = 1
+    while t.timeit(number) < MIN_TIME:
+        number *= 2
+    return number
+
+
+def reference_time():
+    """
+    The time of the calibration busy loop: the unit of the normalized times.
+    """
+    return min(Timer(lambda: busy_loop(CALIBRATION_ITERATIONS)).repeat(3, 1))
+
+
+def measure(f):
+    """
+    :return: (the median time of a single run of f (seconds), the median normalized time). Each measurement
+        is normalized by the reference time taken right before it.
+    """
+    t = Timer(f)
+    number = run_count(t)
+    times, normalized = [], []
+    for _ in range(REPEAT):
+        ref = reference_time()
+        elapsed = t.timeit(number) / number
+        times.append(elapsed)
+        normalized.append(elapsed / ref)
+    return median(times), median(normalized)
+
+
+def run(scales, only=None):
+    """
+    :return: {'<scenario>@<scale>': (seconds, normalized time)}
+    """
+    old_clock = set_clock(VirtualClock())
+    try:
+        ironbot.ROBOT_LIBRARY_LISTENER.start_test('bench', {})
+        res = {}
+        for name, max_scale, setup in SCENARIOS:
+            if only and not name.startswith(only):
+                continue
+            for n in scales:
+                if max_scale is not None and n > max_scale:
+                    continue
+                res['%s@%d' % (name, n)] = measure(setup(n))
+        return res
+    finally:
+        set_clock(old_clock)
+
+
+def load_baselines(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except IOError:
+        return {}
+
+
+def save_baselines(path, baselines):
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def report(results, baselines, threshold=None):
+    """
+    :param threshold: the allowed slowdown for all of the scales, None for the default ones.
+    :return: The names of the regressed measurements.
+    """
+    regressions = []
+    for key in sorted(results, key=lambda k: (k.split('@')[0], int(k.split('@')[1]))):
+        t, norm = results[key]
+        base = baselines.get(key)
+        if base is None:
+            verdict = 'no baseline'
+        else:
+            ratio = norm / base
+            verdict = 'x%.2f' % ratio
+            allowed = threshold
+            if allowed is None:
+                allowed = SCALE_THRESHOLDS.get(int(key.split('@')[1]), THRESHOLD)
+            #The absolute slowdown: the time the baseline stands for on this computer now
+            slowdown = t - t / ratio
+            if ratio > 1.0 + allowed and slowdown > NOISE_FLOOR:
+                verdict += '  REGRESSION'
+                regressions.append(key)
+        print '%-30s %12.1f us %12.4f  %s' % (key, t * 1e6, norm, verdict)
+    return regressions
+
+
+def main(argv):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--scales', default=','.join(map(str, SCALES)), help='comma separated scales')
+    parser.add_option('--only', default=None, help='run the scenarios starting with that prefix only')
+    parser.add_option('--threshold', type='float', default=None,
+                      help='the allowed slowdown for all of the scales (0.25 is 25%%), by default %g, %s'
+                           % (THRESHOLD, ', '.join(['%g at %d' % (v, k) for k, v in sorted(SCALE_THRESHOLDS.items())])))
+    parser.add_option('--baselines', default=BASELINES, help='the baselines file')
+    parser.add_option('--update', action='store_true', default=False, help='store the results as the baselines')
+    options, _ = parser.parse_args(argv)
+
+    results = run([int(s) for s in options.scales.split(',')], options.only)
+    implementation = platform.python_implementation()
+    stored = load_baselines(options.baselines)
+    baselines = stored.get(implementation, {})
+    print '%-30s %15s %12s  %s' % ('scenario@scale', 'time', 'normalized', 'vs baseline')
+    regressions = report(results, baselines, options.threshold)
+    if options.update:
+        baselines.update(dict([(k, norm) for k, (t, norm) in results.iteritems()]))
+        stored[implementation] = baselines
+        save_baselines(options.baselines, stored)
+        print 'Baselines updated: %s' % options.baselines
+        return 0
+    if regressions:
+        print '%d regression(s): %s' % (len(regressions), ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
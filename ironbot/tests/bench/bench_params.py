@@ -0,0 +1,49 @@
+#Per-call overhead of keyword argument parsing: the plain parsers vs the memoized parse plan.
+#Run from this directory: python bench_params.py [iterations]
+
+import sys
+from os.path import dirname, abspath, join
+from timeit import Timer
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', 'src', 'R2D2', 'impl'))
+
+from _params import ParsePlan, ArgStream, parse_positional, parse_named
+from _white_core import CTL_GET_PARAMS, CTL_ATTRS
+
+
+class Window(object):
+    pass
+
+
+CALLS = (
+    ('button', 'parent', Window(), 'automation_id', 'AID_Button1', 'single'),
+    ('all', 'parent', Window(), 're_name', '^Item [0-9]+$', 'enabled', 'timeout', '~5s', 'number', '3'),
+)
+
+
+def before(a):
+    params = ArgStream(a)
+    fixed = parse_positional(CTL_GET_PARAMS[0], params)
+    named = parse_named(CTL_GET_PARAMS[1], CTL_ATTRS, params, 'wait', True)
+    return fixed, named
+
+
+PLAN = ParsePlan(CTL_GET_PARAMS, CTL_ATTRS, 'wait', True)
+
+
+def after(a):
+    return PLAN.parse(a)
+
+
+def main(n=20000):
+    for a in CALLS:
+        assert sorted(before(a)[1].keys()) == sorted(after(a)[1].keys())
+        t_before = min(Timer(lambda: before(a)).repeat(3, n)) / n
+        t_after = min(Timer(lambda: after(a)).repeat(3, n)) / n
+        print "%-60s before: %7.2f us  after: %7.2f us  (x%.1f)" % (
+            ' | '.join([v if isinstance(v, str) else '${obj}' for v in a])[:60],
+            t_before * 1e6, t_after * 1e6, t_before / t_after)
+
+
+if __name__ == "__main__":
+    main(*[int(v) for v in sys.argv[1:]])
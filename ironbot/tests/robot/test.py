@@ -1,3 +0,0 @@
-i=0
-while i<10000000:
-   i=i+1